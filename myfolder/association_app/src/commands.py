@@ -0,0 +1,493 @@
+"""flask 命令行工具：运维与压测命令
+
+用法示例：
+    FLASK_APP=src.main flask recount-registrations
+    FLASK_APP=src.main flask db-upgrade
+    FLASK_APP=src.main flask explain-queries --blueprint activities
+    FLASK_APP=src.main flask build-assets
+    FLASK_APP=src.main flask rebuild-search-index
+    FLASK_APP=src.main flask slow-queries --top 10
+    FLASK_APP=src.main flask bench-registration --seats 100 --students 500
+    FLASK_APP=src.main flask bench-waiting-room --students 400 --threads 8
+    FLASK_APP=src.main flask bench-passwords --logins 200 --concurrency 8
+    FLASK_APP=src.main flask bench-serializers --rows 10000
+    FLASK_APP=src.main flask bench-user-search --users 100000
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+
+
+def _scratch_app(**config):
+    """在临时目录的 SQLite 库（及独立的共享状态文件）上创建一个应用实例，供压测使用
+
+    config 中的键值以环境变量形式传给 create_app。
+    """
+    from src.main import create_app
+
+    workdir = tempfile.mkdtemp(prefix='cqnu_bench_')
+    overrides = {
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+        'SHARED_STATE_PATH': os.path.join(workdir, 'shared_state.db'),
+        **{key: str(value) for key, value in config.items()},
+    }
+    saved = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        return create_app()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _serve_pooled(app, threads):
+    """在本机随机端口启动 WSGI 服务，请求由固定大小的线程池处理（模拟 gunicorn 的
+    worker × 线程总数），返回 (server, 端口)；用完调用 server.shutdown()"""
+    import threading
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class PooledServer(WSGIServer):
+        request_queue_size = 1024
+
+        def __init__(self):
+            super().__init__(('127.0.0.1', 0), QuietHandler)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def server_close(self):
+            super().server_close()
+            self.pool.shutdown(wait=False)
+
+    server = PooledServer()
+    server.set_app(app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def register_commands(app):
+    """把命令挂到 app.cli 上"""
+
+    @app.cli.command('recount-registrations')
+    def recount_registrations():
+        """按报名表批量重算活动/用户的报名计数和剩余名额"""
+        from src.models import db
+        from src.utils import counters
+
+        counters.recount_all()
+        db.session.commit()
+        click.echo('报名计数已重算')
+
+    @app.cli.command('db-upgrade')
+    @click.option('--status', 'show_status', is_flag=True, help='只列出各迁移版本的执行情况')
+    def db_upgrade(show_status):
+        """执行尚未应用的数据库结构迁移（补列、补索引）"""
+        from src.utils import migrations
+
+        if show_status:
+            for version, description, applied_at in migrations.status():
+                click.echo(f'{version:>4}  {str(applied_at or "未执行"):<26}  {description}')
+            return
+        applied = migrations.upgrade()
+        click.echo(f'已执行迁移: {", ".join(map(str, applied))}' if applied else '数据库结构已是最新')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """清空并按活动表重建全文检索索引"""
+        from src.models import db
+        from src.utils import activity_search
+
+        with db.engine.begin() as conn:
+            if not activity_search.create_index(conn):
+                click.echo('当前数据库不支持全文索引，检索使用 LIKE 匹配')
+                return
+            backend = activity_search.detect_backend(conn)
+            total = activity_search.rebuild(conn, backend)
+        app.extensions['activity_search'] = backend
+        click.echo(f'全文索引已重建（{backend}）: {total} 个活动')
+
+    @app.cli.command('slow-queries')
+    @click.option('--top', default=10, show_default=True, help='输出条数')
+    @click.option('--by', type=click.Choice(['statement', 'route']), default='statement',
+                  show_default=True, help='按语句或来源路由汇总')
+    @click.option('--file', 'path', default=None, help='日志文件，默认为 SLOW_QUERY_LOG')
+    @click.option('--plan/--no-plan', default=True, help='输出最慢一次的执行计划')
+    def slow_queries_report(top, by, path, plan):
+        """汇总慢查询日志，按总耗时列出最严重的语句"""
+        import json
+
+        from src.utils import slow_queries
+
+        path = path or app.config['SLOW_QUERY_LOG']
+        groups = slow_queries.summarize(slow_queries.read_records(path), by=by)
+        if not groups:
+            click.echo(f'没有慢查询记录（{path}）')
+            return
+        total = sum(g['count'] for g in groups)
+        click.echo(f'共 {total} 条慢查询，{len(groups)} 个不同{"语句" if by == "statement" else "来源"}')
+        for rank, group in enumerate(groups[:top], 1):
+            click.echo(f'\n#{rank}  总耗时 {group["total_ms"]:.1f}ms  次数 {group["count"]}  '
+                       f'平均 {group["total_ms"] / group["count"]:.1f}ms  最长 {group["max_ms"]:.1f}ms')
+            click.echo(f'    {group["key"][:500]}')
+            routes = sorted(group['routes'].items(), key=lambda item: item[1], reverse=True)
+            click.echo('    来源: ' + ', '.join(f'{route} ×{count}' for route, count in routes[:5]))
+            slowest = group['slowest']
+            if by == 'route':
+                click.echo(f'    最慢语句: {slowest["statement"][:300]}')
+            click.echo(f'    最慢一次参数: {json.dumps(slowest.get("parameters"), ensure_ascii=False)}')
+            if plan and slowest.get('plan'):
+                for line in slowest['plan']:
+                    click.echo(f'      {line}')
+
+    @app.cli.command('explain-queries')
+    @click.option('--blueprint', default=None, help='只输出指定蓝图的查询')
+    def explain_queries(blueprint):
+        """输出各接口热点查询的执行计划，检查是否命中索引"""
+        from src.models import db
+        from src.utils import query_plans
+
+        with db.engine.connect() as conn:
+            for name, queries in query_plans.hot_queries(conn).items():
+                if blueprint and name != blueprint:
+                    continue
+                click.echo(f'== {name} ==')
+                for label, stmt in queries:
+                    click.echo(f'-- {label}')
+                    for line in query_plans.explain(conn, stmt):
+                        click.echo(f'   {line}')
+
+    @app.cli.command('build-assets')
+    def build_assets():
+        """生成带指纹的静态资源副本与 gzip/brotli 预压缩文件"""
+        from src.utils import static_assets
+
+        manifest = static_assets.build(app.static_folder)
+        for source, target in sorted(manifest.items()):
+            click.echo(f'{source} -> {target}')
+        if static_assets.brotli is None:
+            click.echo('未安装 brotli，仅生成 gzip 预压缩文件')
+
+    @app.cli.command('bench-registration')
+    @click.option('--seats', default=100, show_default=True, help='活动名额')
+    @click.option('--students', default=500, show_default=True, help='同时报名的学生数')
+    @click.option('--threads', default=16, show_default=True, help='并发线程数')
+    def bench_registration(seats, students, threads):
+        """在临时 SQLite 库上模拟报名高峰，校验不超卖并报告吞吐"""
+        from src.models import db, User, Activity, Registration
+
+        # 关闭排队，让所有请求直接争抢名额（排队效果见 bench-waiting-room）
+        bench_app = _scratch_app(REGISTRATION_ADMISSION='false')
+        now = datetime.utcnow()
+        with bench_app.app_context():
+            act = Activity(title='压测活动', description='bench', location='bench',
+                           start_time=now + timedelta(days=2), end_time=now + timedelta(days=3),
+                           registration_deadline=now + timedelta(days=1), max_participants=seats)
+            db.session.add(act)
+            # 压测不关心密码，直接写入占位哈希，避免逐个计算 PBKDF2
+            db.session.execute(User.__table__.insert(), [
+                {'username': f'bench{i}', 'email': f'bench{i}@example.com',
+                 'password_hash': '!', 'full_name': f'压测{i}', 'role': 'student'}
+                for i in range(students)
+            ])
+            db.session.commit()
+            activity_id = act.id
+            user_ids = [u for (u,) in db.session.query(User.id).all()]
+
+        def attempt(user_id):
+            client = bench_app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+            start = time.perf_counter()
+            resp = client.post(f'/api/registration/activities/{activity_id}/register', json={})
+            return resp.status_code, time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(attempt, user_ids))
+        elapsed = time.perf_counter() - started
+
+        with bench_app.app_context():
+            stored = Registration.query.filter_by(activity_id=activity_id).count()
+            remaining = Activity.query.get(activity_id).seats_remaining
+
+        accepted = sum(1 for code, _ in results if code == 201)
+        latencies = sorted(t for _, t in results)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        click.echo(f'请求数 {len(results)}，耗时 {elapsed:.2f}s，吞吐 {len(results) / elapsed:.1f} req/s，p99 {p99 * 1000:.1f}ms')
+        click.echo(f'报名成功 {accepted}，库中报名 {stored}，剩余名额 {remaining}（名额 {seats}）')
+        if stored > seats or accepted != stored:
+            raise click.ClickException('检测到超卖或计数不一致')
+
+    @app.cli.command('bench-waiting-room')
+    @click.option('--seats', default=100, show_default=True, help='活动名额')
+    @click.option('--students', default=400, show_default=True, help='同时抢报名的学生数')
+    @click.option('--threads', default=8, show_default=True, help='服务端处理线程总数')
+    @click.option('--probes', default=4, show_default=True, help='同时访问无关接口的客户端数')
+    def bench_waiting_room(seats, students, threads, probes):
+        """报名高峰期间测量无关接口（活动列表、/api/auth/me）的延迟，对比有无报名候场"""
+        import http.client
+        import json
+        import threading
+
+        from src.models import db, User, Activity
+        from src.utils import tokens
+
+        def request(port, method, path, token, headers=None):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            try:
+                conn.request(method, path, body=b'{}' if method == 'POST' else None, headers={
+                    'Authorization': f'Bearer {token}', 'Content-Type': 'application/json',
+                    **(headers or {})})
+                resp = conn.getresponse()
+                return resp.status, resp.read()
+            finally:
+                conn.close()
+
+        def run(admission):
+            bench_app = _scratch_app(REGISTRATION_ADMISSION=str(admission).lower())
+            now = datetime.utcnow()
+            with bench_app.app_context():
+                act = Activity(title='热门活动', description='bench', location='bench',
+                               start_time=now + timedelta(days=2), end_time=now + timedelta(days=3),
+                               registration_deadline=now + timedelta(days=1), max_participants=seats)
+                db.session.add(act)
+                db.session.execute(User.__table__.insert(), [
+                    {'username': f'bench{i}', 'email': f'bench{i}@example.com',
+                     'password_hash': '!', 'full_name': f'压测{i}', 'role': 'student'}
+                    for i in range(students + probes)
+                ])
+                db.session.commit()
+                activity_id = act.id
+                access = [tokens.issue_tokens(user)['access_token'] for user in User.query.all()]
+            student_tokens, probe_tokens = access[:students], access[students:]
+            server, port = _serve_pooled(bench_app, threads)
+
+            def probe_loop(token, stop, out):
+                paths = ('/api/activities', '/api/auth/me')
+                i = 0
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    request(port, 'GET', paths[i % 2], token)
+                    out.append(time.perf_counter() - started)
+                    i += 1
+                    time.sleep(0.01)
+
+            def measure(seconds=None, until=None):
+                stop, out = threading.Event(), []
+                workers = [threading.Thread(target=probe_loop, args=(t, stop, out)) for t in probe_tokens]
+                for w in workers:
+                    w.start()
+                if until is not None:
+                    until()
+                else:
+                    time.sleep(seconds)
+                stop.set()
+                for w in workers:
+                    w.join()
+                return sorted(out)
+
+            def student(token):
+                ticket, attempts = None, 0
+                while True:
+                    attempts += 1
+                    status, body = request(port, 'POST',
+                                           f'/api/registration/activities/{activity_id}/register',
+                                           token, {'X-Queue-Ticket': ticket} if ticket else None)
+                    if status != 429:
+                        return status, attempts
+                    data = json.loads(body)
+                    ticket = data['ticket']
+                    time.sleep(data['retry_after'])
+
+            def rush():
+                nonlocal results, rush_time
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=students) as pool:
+                    results = list(pool.map(student, student_tokens))
+                rush_time = time.perf_counter() - started
+
+            results, rush_time = [], 0
+            try:
+                quiet = measure(seconds=2)
+                busy = measure(until=rush)
+            finally:
+                server.shutdown()
+                server.server_close()
+            accepted = sum(1 for status, _ in results if status == 201)
+            requests_sent = sum(attempts for _, attempts in results)
+            label = '开启候场' if admission else '关闭候场'
+            click.echo(f'{label}：报名成功 {accepted}/{seats}，报名请求 {requests_sent} 次，'
+                       f'高峰持续 {rush_time:.2f}s')
+            click.echo(f'  无关接口 平时 p50 {_percentile(quiet, 0.5) * 1000:.1f}ms '
+                       f'p99 {_percentile(quiet, 0.99) * 1000:.1f}ms；'
+                       f'高峰 p50 {_percentile(busy, 0.5) * 1000:.1f}ms '
+                       f'p99 {_percentile(busy, 0.99) * 1000:.1f}ms（{len(busy)} 次）')
+
+        click.echo(f'{students} 名学生抢 {seats} 个名额，服务端 {threads} 个处理线程')
+        run(admission=False)
+        run(admission=True)
+
+    @app.cli.command('bench-passwords')
+    @click.option('--logins', default=100, show_default=True, help='每种配置模拟的登录次数')
+    @click.option('--concurrency', default=8, show_default=True, help='并发请求线程数')
+    @click.option('--workers', default=os.cpu_count() or 2, show_default=True, help='进程池大小')
+    def bench_passwords(logins, concurrency, workers):
+        """对比不同哈希算法/强度/进程池配置下每秒可完成的登录校验数"""
+        from src.utils.passwords import PasswordHasher, bcrypt
+
+        configs = [('pbkdf2:sha256', 260000), ('pbkdf2:sha256', 100000)]
+        if bcrypt is not None:
+            configs += [('bcrypt', 12), ('bcrypt', 10)]
+
+        click.echo(f'{"算法":<16}{"强度":>8}{"进程池":>8}{"登录/秒":>10}{"p99(ms)":>10}')
+        for method, cost in configs:
+            for pool_size in (0, workers):
+                hasher = PasswordHasher(method, cost, workers=pool_size,
+                                        max_pending=concurrency * 2, timeout=60)
+                stored = hasher.hash('bench-password')
+
+                def login(_):
+                    start = time.perf_counter()
+                    assert hasher.verify(stored, 'bench-password')
+                    return time.perf_counter() - start
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    latencies = sorted(pool.map(login, range(logins)))
+                elapsed = time.perf_counter() - started
+                hasher.shutdown()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                click.echo(f'{method:<16}{cost:>8}{pool_size:>8}{logins / elapsed:>10.1f}{p99 * 1000:>10.1f}')
+
+    @app.cli.command('bench-serializers')
+    @click.option('--rows', default=10000, show_default=True, help='活动与用户各插入的行数')
+    @click.option('--repeat', default=3, show_default=True, help='每种方式重复次数，取最快一次')
+    def bench_serializers(rows, repeat):
+        """对比列表接口的 ORM + to_dict 与列投影两种序列化方式"""
+        import json
+
+        from src.models import db, User, Activity
+        from src.utils import serializers
+
+        bench_app = _scratch_app()
+        now = datetime.utcnow()
+        with bench_app.app_context():
+            db.session.execute(Activity.__table__.insert(), [
+                {'title': f'活动{i}', 'description': '压测' * 20, 'location': '教学楼',
+                 'start_time': now + timedelta(days=2), 'end_time': now + timedelta(days=3),
+                 'registration_deadline': now + timedelta(days=1), 'max_participants': 100,
+                 'seats_remaining': 100, 'status': 'active', 'created_at': now, 'updated_at': now}
+                for i in range(rows)
+            ])
+            db.session.execute(User.__table__.insert(), [
+                {'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password_hash': '!',
+                 'full_name': f'压测{i}', 'role': 'student', 'created_at': now, 'last_login': now}
+                for i in range(rows)
+            ])
+            db.session.commit()
+
+            cases = [
+                ('activities', Activity, serializers.ACTIVITY),
+                ('users', User, serializers.USER),
+            ]
+            click.echo(f'{"列表":<12}{"to_dict(ms)":>14}{"投影(ms)":>12}{"加速":>8}')
+            for name, model, projection in cases:
+                def orm_path():
+                    items = [obj.to_dict() for obj in model.query.order_by(model.id).all()]
+                    body = json.dumps(items)
+                    db.session.expunge_all()
+                    return items, body
+
+                def projection_path():
+                    items = projection.serialize(
+                        model.query.with_entities(*projection.columns()).order_by(model.id).all())
+                    body = serializers.orjson.dumps(items) if serializers.orjson else json.dumps(items)
+                    return items, body
+
+                timings = {}
+                for label, fn in (('orm', orm_path), ('projection', projection_path)):
+                    best = None
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        items, _ = fn()
+                        elapsed = time.perf_counter() - started
+                        best = elapsed if best is None else min(best, elapsed)
+                    timings[label] = (best, items)
+                if timings['orm'][1] != timings['projection'][1]:
+                    raise click.ClickException(f'{name}: 两种方式输出不一致')
+                orm_ms, proj_ms = timings['orm'][0] * 1000, timings['projection'][0] * 1000
+                click.echo(f'{name:<12}{orm_ms:>14.1f}{proj_ms:>12.1f}{orm_ms / proj_ms:>7.1f}x')
+        click.echo(f'JSON 编码器: {"orjson" if serializers.orjson else "json"}')
+
+    @app.cli.command('bench-user-search')
+    @click.option('--users', default=100000, show_default=True, help='插入的用户数')
+    @click.option('--limit', default=20, show_default=True, help='每页条数')
+    def bench_user_search(users, limit):
+        """在临时库上插入大量用户，测量用户目录各类检索的耗时"""
+        import random
+
+        from src.models import db, User
+        from src.utils import user_directory
+        from src.utils.serializers import USER
+
+        bench_app = _scratch_app()
+        rng = random.Random(42)
+        surnames = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+        departments = [f'学院{i}' for i in range(20)]
+        with bench_app.app_context():
+            for start in range(0, users, 10000):
+                db.session.execute(User.__table__.insert(), [
+                    {'username': f'user{i:06d}', 'email': f'user{i:06d}@stu.cqnu.edu.cn',
+                     'password_hash': '!', 'full_name': rng.choice(surnames) + f'同学{i}',
+                     'student_id': f'2023{i:07d}', 'department': rng.choice(departments),
+                     'major': f'专业{rng.randrange(5)}', 'role': 'student'}
+                    for i in range(start, min(users, start + 10000))
+                ])
+            db.session.commit()
+            db.session.execute('ANALYZE')
+
+            cases = [
+                ('用户名前缀', {'q': 'user0123'}),
+                ('姓名前缀', {'q': '王同学1'}),
+                ('学号前缀', {'q': '2023000045'}),
+                ('宽泛前缀', {'q': 'u'}),
+                ('集中前缀', {'q': 'user01'}),
+                ('院系+专业', {'filters': {'department': '学院3', 'major': '专业1'}}),
+                ('前缀+院系', {'q': '张', 'filters': {'department': '学院7'}}),
+                ('无条件首页', {}),
+            ]
+            click.echo(f'{"检索":<12}{"结果数":>8}{"p50(ms)":>10}{"max(ms)":>10}')
+            for label, kwargs in cases:
+                timings = []
+                for _ in range(20):
+                    started = time.perf_counter()
+                    rows = user_directory.build_query(**kwargs) \
+                        .with_entities(*USER.columns()).limit(limit + 1).all()
+                    USER.serialize(rows)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                click.echo(f'{label:<12}{len(rows):>8}{timings[len(timings) // 2]:>10.2f}{timings[-1]:>10.2f}')
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, jsonify
 import os
 from dotenv import load_dotenv
 import logging
@@ -19,9 +19,96 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev_key_for_development')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///database.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 数据库引擎配置档：auto / sqlite / postgres / default
+    app.config['DB_ENGINE_PROFILE'] = os.getenv('DB_ENGINE_PROFILE', 'auto')
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_STATEMENT_TIMEOUT'] = int(os.getenv('DB_STATEMENT_TIMEOUT', 15000))
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
 
-    # 日志目录自动创建
     project_root = os.path.abspath(os.path.join(base, os.pardir))
+    # 跨 worker 共享状态（缓存版本号、快照等）
+    app.config['SHARED_STATE_PATH'] = os.getenv(
+        'SHARED_STATE_PATH', os.path.join(project_root, 'run', 'shared_state.db'))
+    app.config['DASHBOARD_STATS_TTL'] = int(os.getenv('DASHBOARD_STATS_TTL', 30))
+    app.config['ACTIVITY_COUNT_TTL'] = int(os.getenv('ACTIVITY_COUNT_TTL', 60))
+    # 活动接口响应缓存（每个 worker 一份 LRU）
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512))
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    app.config['RESPONSE_CACHE_TTL'] = int(os.getenv('RESPONSE_CACHE_TTL', 30))
+
+    # 密码哈希：算法、强度与进程池卸载
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    app.config['PASSWORD_HASH_COST'] = int(os.getenv('PASSWORD_HASH_COST', 0)) or None
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 0))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # 写后缓冲：last_login 等非关键字段批量落库
+    app.config['WRITE_BEHIND_INTERVAL'] = float(os.getenv('WRITE_BEHIND_INTERVAL', 5))
+    app.config['WRITE_BEHIND_MAX_ITEMS'] = int(os.getenv('WRITE_BEHIND_MAX_ITEMS', 500))
+
+    # 令牌认证：访问令牌 / 刷新令牌有效期与吊销列表刷新间隔（秒）
+    app.config['JWT_ACCESS_TTL'] = int(os.getenv('JWT_ACCESS_TTL', 15 * 60))
+    app.config['JWT_REFRESH_TTL'] = int(os.getenv('JWT_REFRESH_TTL', 14 * 86400))
+    app.config['TOKEN_REVOCATION_REFRESH'] = float(os.getenv('TOKEN_REVOCATION_REFRESH', 15))
+
+    # 上传图片：变体生成线程数、编码质量、上传接口等待变体的秒数
+    app.config['IMAGE_VARIANT_WORKERS'] = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+    app.config['IMAGE_QUALITY'] = int(os.getenv('IMAGE_QUALITY', 82))
+    app.config['IMAGE_RESPONSE_WAIT'] = float(os.getenv('IMAGE_RESPONSE_WAIT', 3))
+
+    # 静态资源：启动时生成带指纹的副本与预压缩文件（也可用 flask build-assets）
+    app.config['STATIC_BUILD_ON_START'] = os.getenv('STATIC_BUILD_ON_START', 'true').lower() == 'true'
+
+    # 登录/注册限流：规则为 "次数/秒数"，用户名规则按 (用户名, IP) 计数；
+    # backend=shared 为各 worker 合计；memory 每个 worker 各自计数，仅适合单 worker，
+    # 多 worker 时实际上限约为配置值 × worker 数
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'shared')
+    app.config['RATE_LIMIT_LOGIN_IP'] = os.getenv('RATE_LIMIT_LOGIN_IP', '30/60')
+    app.config['RATE_LIMIT_LOGIN_USER'] = os.getenv('RATE_LIMIT_LOGIN_USER', '10/300')
+    app.config['RATE_LIMIT_REGISTER_IP'] = os.getenv('RATE_LIMIT_REGISTER_IP', '10/3600')
+    # 反向代理层数：大于 0 时按 X-Forwarded-For 识别客户端 IP（限流按 IP 计数）
+    app.config['TRUSTED_PROXIES'] = int(os.getenv('TRUSTED_PROXIES', 0))
+
+    # 报名候场：按活动排队放行的速率与突发量、每个 worker 的报名写入并发、候场凭证有效期（秒）
+    app.config['REGISTRATION_ADMISSION'] = os.getenv('REGISTRATION_ADMISSION', 'true').lower() == 'true'
+    app.config['REGISTRATION_ADMIT_RATE'] = float(os.getenv('REGISTRATION_ADMIT_RATE', 20))
+    app.config['REGISTRATION_ADMIT_BURST'] = int(os.getenv('REGISTRATION_ADMIT_BURST', 20))
+    app.config['REGISTRATION_CONCURRENCY'] = int(os.getenv('REGISTRATION_CONCURRENCY', 2))
+    app.config['REGISTRATION_TICKET_TTL'] = int(os.getenv('REGISTRATION_TICKET_TTL', 600))
+
+    # 名额实时推送（SSE）：auto 只在 gevent worker 中开启（见 DEPLOYMENT_GUIDE），true/false 强制开关；
+    # 每个 worker 的连接总数与单个 IP 的连接数上限（0 不限），超出时返回 503，前端改为轮询
+    app.config['SSE_ENABLED'] = os.getenv('SSE_ENABLED', 'auto').lower()
+    app.config['SSE_MAX_STREAMS'] = int(os.getenv('SSE_MAX_STREAMS', 2000))
+    app.config['SSE_MAX_STREAMS_PER_IP'] = int(os.getenv('SSE_MAX_STREAMS_PER_IP', 20))
+    app.config['SSE_FALLBACK_POLL'] = int(os.getenv('SSE_FALLBACK_POLL', 15))
+    # 合并周期、心跳间隔与单条连接最长时长（秒）
+    app.config['SSE_COALESCE_INTERVAL'] = float(os.getenv('SSE_COALESCE_INTERVAL', 1))
+    app.config['SSE_HEARTBEAT'] = float(os.getenv('SSE_HEARTBEAT', 15))
+    app.config['SSE_MAX_DURATION'] = float(os.getenv('SSE_MAX_DURATION', 300))
+
+    # 请求指标（/metrics）：N+1 告警阈值（单请求 SQL 语句数，0 关闭）、各 worker 上报间隔、
+    # 抓取令牌（未设置时只允许本机抓取）
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_N_PLUS_ONE_THRESHOLD'] = int(os.getenv('METRICS_N_PLUS_ONE_THRESHOLD', 20))
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+
+    # 慢查询日志：阈值（毫秒，0 关闭）、JSON Lines 文件位置、参数脱敏与自动 EXPLAIN
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+    app.config['SLOW_QUERY_LOG'] = os.getenv(
+        'SLOW_QUERY_LOG', os.path.join(project_root, 'logs', 'slow_queries.jsonl'))
+    app.config['SLOW_QUERY_REDACT'] = os.getenv('SLOW_QUERY_REDACT', 'true').lower() == 'true'
+    app.config['SLOW_QUERY_EXPLAIN'] = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+
+    # 日志目录自动创建
     log_dir = os.path.join(project_root, 'logs')
     os.makedirs(log_dir, exist_ok=True)
     if not app.debug:
@@ -37,10 +124,37 @@ def create_app():
         app.logger.setLevel(logging.INFO)
         app.logger.info('Application startup')
 
+    from src.utils import passwords, write_behind
+    passwords.init_app(app)
+    write_behind.init_app(app)
+
     # 数据库初始化
     from src.models import db, init_db
     db.init_app(app)
     init_db(app)
+    # 注册报名计数的 flush 钩子
+    import src.utils.counters  # noqa: F401
+
+    from src.utils import (activity_search, admission, images, metrics, rate_limit,
+                           response_cache, seat_events, shared_state, slow_queries, spa_shell,
+                           static_assets, tokens)
+    # 活动写入时同步全文索引（flush 钩子在模块导入时注册）
+    activity_search.init_app(app)
+    shared_state.init_app(app)
+    response_cache.init_app(app)
+    seat_events.init_app(app)
+    admission.init_app(app)
+    rate_limit.init_app(app)
+    metrics.init_app(app)
+    slow_queries.init_app(app)
+    if app.config['TRUSTED_PROXIES']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'],
+                                x_proto=app.config['TRUSTED_PROXIES'])
+    tokens.init_app(app)
+    images.init_app(app)
+    static_assets.init_app(app)
+    spa_shell.init_app(app)
 
     # 注册蓝图并统一挂载到 /api 前缀
     from src.routes.auth import auth_bp
@@ -55,16 +169,16 @@ def create_app():
     app.register_blueprint(dashboard_bp,    url_prefix='/api/dashboard')
     app.register_blueprint(upload_bp,       url_prefix='/api/upload')
 
+    # 命令行工具
+    from src.commands import register_commands
+    register_commands(app)
+
     # SPA 前端入口
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def catch_all(path):
-        return render_template(
-            'index.html',
-            currentUser={'username': ''},
-            toastTitle='',
-            toastMessage=''
-        )
+        # 入口页只按模板版本渲染一次，之后直接返回缓存的字节
+        return spa_shell.shell_response()
 
     # 调试用
     @app.route('/__debug__')
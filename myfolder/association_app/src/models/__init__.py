@@ -6,12 +6,19 @@ db = SQLAlchemy()
 from src.models.user import User
 from src.models.activity import Activity
 from src.models.registration import Registration
+from src.models.image import UploadedImage
 
 def init_db(app):
     """初始化数据库并建表"""
     db.init_app(app)
+    # 引擎配置档（连接池、SQLite PRAGMA）须在第一个连接建立前设置
+    from src.utils import db_engine
+    db_engine.init_app(app)
     with app.app_context():
         db.create_all()
+        # 给已有的库补齐新增的列与索引
+        from src.utils import migrations
+        migrations.upgrade()
 
 def create_default_admin():
     """创建默认管理员账户"""
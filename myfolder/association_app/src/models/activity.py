@@ -1,10 +1,17 @@
 # 文件：src/models/activity.py
 
 from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import validates
 from src.models import db
 
 class Activity(db.Model):
     __tablename__ = 'activities'
+    __table_args__ = (
+        db.Index('ix_activities_created_at', 'created_at', 'id'),
+        db.Index('ix_activities_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_activities_status_start_time', 'status', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128), nullable=False)
@@ -14,10 +21,50 @@ class Activity(db.Model):
     end_time = db.Column(db.DateTime, nullable=False)
     registration_deadline = db.Column(db.DateTime, nullable=False)
     max_participants = db.Column(db.Integer)
+    # 剩余名额计数器：为空表示不限人数，新建活动时取 max_participants
+    seats_remaining = db.Column(
+        db.Integer,
+        default=lambda ctx: ctx.get_current_parameters().get('max_participants')
+    )
+    status = db.Column(db.String(20), nullable=False, default='active')
+    # 报名计数（冗余字段，由 src.utils.counters 随报名写入同步维护）
+    registration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    active_registration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     image_url = db.Column(db.String(512))
+    # 响应式图片 srcset，取自 uploaded_images，变体生成完成后由图片管道回填
+    image_srcset = db.Column(db.String(1024))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    @validates('max_participants')
+    def _sync_seats_remaining(self, key, value):
+        """修改人数上限时，按现有占位报名重新计算剩余名额"""
+        if self.id is not None:
+            if value is None:
+                self.seats_remaining = None
+            else:
+                from src.models.registration import Registration
+                from src.utils.seats import SEAT_HOLDING_STATUSES
+                held = select(func.count(Registration.id)).where(
+                    Registration.activity_id == self.id,
+                    Registration.status.in_(SEAT_HOLDING_STATUSES)
+                ).scalar_subquery()
+                self.seats_remaining = value - held
+        return value
+
+    @validates('image_url')
+    def _sync_image_srcset(self, key, value):
+        """更换图片时从上传记录取 srcset，变体尚未生成时为空"""
+        from src.models.image import UploadedImage
+        content_hash = UploadedImage.hash_from_url(value)
+        if content_hash is None:
+            self.image_srcset = None
+        else:
+            self.image_srcset = select(UploadedImage.srcset).where(
+                UploadedImage.content_hash == content_hash
+            ).scalar_subquery()
+        return value
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -28,7 +75,10 @@ class Activity(db.Model):
             'end_time': self.end_time.isoformat(),
             'registration_deadline': self.registration_deadline.isoformat(),
             'max_participants': self.max_participants,
+            'seats_remaining': self.seats_remaining,
+            'status': self.status,
             'image_url': self.image_url,
+            'image_srcset': self.image_srcset,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -0,0 +1,58 @@
+from datetime import datetime
+import json
+import re
+
+from src.models import db
+
+_URL_PATTERN = re.compile(r'^/static/uploads/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+
+class UploadedImage(db.Model):
+    """上传的图片，按内容哈希去重，记录各尺寸变体"""
+    __tablename__ = 'uploaded_images'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # 原图内容的 SHA-256，同一内容只保存一份
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)
+    ext = db.Column(db.String(8), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    original_bytes = db.Column(db.Integer, nullable=False)
+    # processing / ready / failed
+    status = db.Column(db.String(20), nullable=False, default='processing')
+    # {变体名: {url, width, height, bytes}}，JSON 文本
+    variants = db.Column(db.Text)
+    # 变体就绪后生成的 srcset，冗余到 activities.image_srcset
+    srcset = db.Column(db.String(1024))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def hash_from_url(url):
+        """从图片地址解析内容哈希，非本管道生成的地址返回 None"""
+        match = _URL_PATTERN.match(url or '')
+        return match.group(1) if match else None
+
+    @property
+    def url(self):
+        return f'/static/uploads/{self.content_hash[:2]}/{self.content_hash}.{self.ext}'
+
+    def variant_dict(self):
+        return json.loads(self.variants) if self.variants else {}
+
+    def to_dict(self):
+        variants = self.variant_dict()
+        return {
+            'content_hash': self.content_hash,
+            'url': self.url,
+            'width': self.width,
+            'height': self.height,
+            'bytes': self.original_bytes,
+            'status': self.status,
+            'srcset': self.srcset,
+            # 各尺寸相对原图节省的字节数
+            'variants': {
+                name: {**v, 'saved_bytes': self.original_bytes - v['bytes'],
+                       'saved_ratio': round(1 - v['bytes'] / self.original_bytes, 3)
+                       if self.original_bytes else 0.0}
+                for name, v in variants.items()
+            }
+        }
@@ -4,17 +4,27 @@ from src.models import db
 class Registration(db.Model):
     """活动报名模型，记录用户报名活动的信息"""
     __tablename__ = 'registrations'
+    # 同一用户对同一活动只能有一条报名记录，由数据库保证；
+    # 该唯一索引以 user_id 开头，同时服务按用户查询
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'activity_id', name='uq_registrations_user_activity'),
+        db.Index('ix_registrations_user_time', 'user_id', 'registration_time', 'id'),
+        db.Index('ix_registrations_activity_status', 'activity_id', 'status'),
+        db.Index('ix_registrations_status', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False)
     registration_time = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='registered')
+    # active_history：状态变化时总能拿到旧值，供报名计数记账
+    status = db.column_property(db.Column(db.String(20), default='registered'), active_history=True)
     notes = db.Column(db.Text, nullable=True)
 
     def __init__(self, user_id, activity_id, notes=None):
         self.user_id = user_id
         self.activity_id = activity_id
+        self.status = 'registered'
         self.notes = notes
 
     def to_dict(self):
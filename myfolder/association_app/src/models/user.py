@@ -1,10 +1,18 @@
 from datetime import datetime
+from sqlalchemy.orm.attributes import set_committed_value
 from src.models import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils import write_behind
+from src.utils.passwords import get_hasher
 
 class User(db.Model):
     """用户模型，包含管理员和普通学生用户"""
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role_created_at', 'role', 'created_at'),
+        # 用户目录检索：姓名前缀与院系/专业过滤（用户名、学号、邮箱已有唯一索引）
+        db.Index('ix_users_full_name', 'full_name'),
+        db.Index('ix_users_department_major', 'department', 'major'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -18,6 +26,9 @@ class User(db.Model):
     role = db.Column(db.String(20), default='student')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime, nullable=True)
+    # 报名计数（冗余字段，由 src.utils.counters 随报名写入同步维护）
+    registration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    active_registration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # 与 Registration 的关系
     registrations = db.relationship('Registration', backref='participant', lazy=True)
@@ -36,21 +47,30 @@ class User(db.Model):
         self.major = major
 
     def set_password(self, password):
-        """设置密码哈希"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码哈希（算法与强度见 src.utils.passwords）"""
+        self.password_hash = get_hasher().hash(password)
 
     def check_password(self, password):
         """验证密码正确性"""
-        return check_password_hash(self.password_hash, password)
+        return get_hasher().verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """存储的哈希参数是否与当前配置不一致"""
+        return get_hasher().needs_rehash(self.password_hash)
 
     def is_admin(self):
         """判断是否管理员"""
         return self.role == 'admin'
 
     def update_last_login(self):
-        """更新最后登录时间"""
-        self.last_login = datetime.utcnow()
-        db.session.commit()
+        """更新最后登录时间：登记到写后缓冲批量落库，未启用缓冲时直接提交"""
+        now = datetime.utcnow()
+        if write_behind.record(User.__table__, self.id, last_login=now):
+            # 只更新内存中的值，不把对象标记为待写入
+            set_committed_value(self, 'last_login', now)
+        else:
+            self.last_login = now
+            db.session.commit()
 
     def to_dict(self):
         """将用户数据序列化为字典"""
@@ -1,12 +1,73 @@
 # 文件：src/routes/activities.py
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
+from flask_sqlalchemy import Pagination
+from sqlalchemy import func
+from src.models import db
 from src.models.activity import Activity
-from datetime import datetime
+from src.utils import activity_search, seat_events
+from src.utils.conditional import add_validators, is_not_modified, make_etag, not_modified_response
+from src.utils.response_cache import cached_response
+from src.utils.serializers import ACTIVITY, json_response
+from src.utils.pagination import InvalidCursor, after_desc, decode_cursor, encode_cursor, read_limit
+from src.utils.shared_state import get_shared_state
+from datetime import datetime, timedelta
+import json
+import time
 
 activity_bp = Blueprint('activities', __name__)
 
+# 活动接口的响应依赖这些表，任一表有写入即令各 worker 的缓存失效
+CACHE_TABLES = ('activities', 'registrations')
+
+def _collection_stats(status, query):
+    """活动总数与最近修改时间：按 status 缓存在共享状态中，activities 表有写入或过期后重算
+
+    返回 (activities 表版本号, 总数, 最近修改时间)；共享状态不可用时版本号为 None。
+    """
+    state = get_shared_state()
+    generations = state.generations(('activities',))
+    key = f'activities:stats:{status}'
+    if generations is not None:
+        cached = state.get(key)
+        if cached:
+            generation, total, last_modified = json.loads(cached)
+            if generation == generations[0]:
+                return generation, total, last_modified and datetime.fromisoformat(last_modified)
+    last_modified, total = query.order_by(None).with_entities(
+        func.max(Activity.updated_at), func.count(Activity.id)).one()
+    if generations is None:
+        return None, total, last_modified
+    state.set(key, json.dumps([generations[0], total, last_modified and last_modified.isoformat()]),
+              ttl=current_app.config['ACTIVITY_COUNT_TTL'])
+    return generations[0], total, last_modified
+
+
+def _cursor_page(query, total):
+    """键集分页：按 (created_at, id) 倒序，next_cursor 为空表示已到末页"""
+    limit = read_limit(request.args, default=request.args.get('per_page', 10, type=int))
+    cursor = request.args.get('cursor')
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, (datetime, int))
+        query = query.filter(after_desc(Activity.created_at, Activity.id, last_created, last_id))
+
+    items = query.with_entities(*ACTIVITY.columns()) \
+                 .order_by(Activity.created_at.desc(), Activity.id.desc()).limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    body = {
+        'success': True,
+        'activities': ACTIVITY.serialize(items),
+        'next_cursor': encode_cursor(items[-1].created_at, items[-1].id) if has_more else None,
+    }
+    # 总数可选：include_total=0 时不输出
+    if request.args.get('include_total', '1') != '0':
+        body['total'] = total
+    return body
+
+
 @activity_bp.route('/', methods=['GET'])
+@cached_response(CACHE_TABLES)
 def get_activities():
     try:
         status   = request.args.get('status', 'all')
@@ -19,31 +80,181 @@ def get_activities():
         if status != 'all':
             query = query.filter_by(status=status)
 
-        pagination = query.order_by(Activity.created_at.desc()) \
-                          .paginate(page=page, per_page=per_page, error_out=False)
-        activities = [a.to_dict() for a in pagination.items]
+        # 条件请求：集合的版本由 activities 表版本号（名额等 Core 更新同样会推进）、
+        # 行数与 max(updated_at) 决定，再叠加查询参数；三者按版本号缓存，深页与首页开销相同
+        generation, total, last_modified = _collection_stats(status, query)
+        etag = make_etag('activities', generation, last_modified, total, request.query_string.decode())
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        # 传入 cursor 参数（首页传空值）即启用键集分页
+        if 'cursor' in request.args:
+            try:
+                return add_validators(json_response(_cursor_page(query, total)), etag, last_modified), 200
+            except InvalidCursor:
+                return jsonify({'success': False, 'activities': [], 'message': '无效的分页游标'}), 400
+
+        # 只查询输出需要的列，按列批量格式化，不构造 ORM 对象；总数沿用上面的计数，不再 COUNT
+        page = max(page, 1)
+        per_page = per_page if per_page >= 0 else 20
+        items = query.with_entities(*ACTIVITY.columns()) \
+                     .order_by(Activity.created_at.desc()) \
+                     .limit(per_page).offset((page - 1) * per_page).all()
+        pagination = Pagination(query, page, per_page, total, items)
+        activities = ACTIVITY.serialize(pagination.items)
 
-        return jsonify({
+        return add_validators(json_response({
             'success': True,
             'activities': activities,
             'total': pagination.total,
             'page': pagination.page,
             'pages': pagination.pages
-        }), 200
+        }), etag, last_modified), 200
 
     except Exception as e:
         current_app.logger.error(f'get_activities error: {e}', exc_info=True)
-        return jsonify({
+        response = jsonify({
             'success': False,
             'activities': [],
             'message': '服务暂不可用，请稍后再试'
-        }), 200
+        })
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 200
+
+def _parse_day_bound(value, end=False):
+    """解析 ISO 日期/时间；只给日期时，作为上界表示当天结束（次日 0 点，不含）"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+@activity_bp.route('/search', methods=['GET'])
+@cached_response(CACHE_TABLES)
+def search_activities():
+    """全文检索标题/描述/地点，按相关度排序；start_from/start_to 按开始时间过滤"""
+    q = request.args.get('q', '').strip()
+    if not activity_search.has_terms(q):
+        return jsonify({'success': False, 'activities': [], 'message': '请输入检索关键词'}), 400
+    try:
+        start_from = _parse_day_bound(request.args.get('start_from'))
+        start_to = _parse_day_bound(request.args.get('start_to'), end=True)
+    except ValueError:
+        return jsonify({'success': False, 'activities': [], 'message': '无效的日期格式'}), 400
+    limit = read_limit(request.args)
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+
+    stmt = activity_search.search_query(activity_search.current_backend(), q, start_from, start_to,
+                                        request.args.get('status'))
+    rows = db.session.execute(stmt.limit(limit + 1).offset((page - 1) * limit)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    activities = ACTIVITY.serialize(rows)
+    score_at = len(ACTIVITY.keys)
+    for item, row in zip(activities, rows):
+        item['score'] = round(float(row[score_at]), 4)
+    return json_response({'success': True, 'activities': activities, 'page': page,
+                          'has_more': has_more}), 200
+
+
+# 单条推送连接最多关注的活动数
+STREAM_MAX_IDS = 100
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def _seat_ids():
+    """解析 ids=1,2,3，返回 (id 集合, 错误响应)"""
+    try:
+        ids = {int(v) for v in request.args.get('ids', '').split(',') if v.strip()}
+    except ValueError:
+        return None, (jsonify({'success': False, 'message': '无效的活动 id'}), 400)
+    if len(ids) > STREAM_MAX_IDS:
+        return None, (jsonify({'success': False, 'message': f'最多关注 {STREAM_MAX_IDS} 个活动'}), 400)
+    return ids, None
+
+
+def _stream_unavailable():
+    """推送未开启或连接数已满：503，客户端按 retry 间隔改为轮询 /seats"""
+    poll = current_app.config['SSE_FALLBACK_POLL']
+    return Response(f'retry: {poll * 1000}\n\n', status=503, mimetype='text/event-stream',
+                    headers={'Retry-After': str(poll), 'Cache-Control': 'no-store'})
+
+
+@activity_bp.route('/seats', methods=['GET'])
+def get_seats():
+    """活动当前剩余名额与状态（推送不可用时的轮询接口）；poll_after 为建议的轮询间隔（秒）"""
+    ids, error = _seat_ids()
+    if error:
+        return error
+    if not ids:
+        return jsonify({'success': False, 'message': '请指定活动 id'}), 400
+    return json_response({'success': True, 'seats': list(seat_events.fetch(ids).values()),
+                          'poll_after': current_app.config['SSE_FALLBACK_POLL']}), 200
+
+
+@activity_bp.route('/seats/stream', methods=['GET'])
+def stream_seats():
+    """推送活动剩余名额与状态的变化；ids=1,2,3 只关注指定活动，省略则推送全部活动"""
+    ids, error = _seat_ids()
+    if error:
+        return error
+
+    broadcaster = seat_events.get_broadcaster()
+    # 长连接只在 gevent 进程中提供，普通 worker 的线程不被占住
+    if not broadcaster.enabled:
+        return _stream_unavailable()
+    heartbeat = current_app.config['SSE_HEARTBEAT']
+    max_duration = current_app.config['SSE_MAX_DURATION']
+    # 先订阅再取快照，快照之后的变化不会漏掉
+    subscriber = broadcaster.subscribe(ids or None, client=request.remote_addr)
+    if subscriber is None:
+        return _stream_unavailable()
+    try:
+        snapshot = list(seat_events.fetch(ids).values()) if ids else []
+    except Exception:
+        broadcaster.unsubscribe(subscriber)
+        raise
+
+    def generate():
+        try:
+            # 连接到期断开后浏览器按 retry 毫秒自动重连，重连时重新下发快照
+            yield 'retry: 3000\n\n'
+            if snapshot:
+                yield _sse('snapshot', snapshot)
+            deadline = time.monotonic() + max_duration
+            while time.monotonic() < deadline:
+                events = subscriber.wait(min(heartbeat, deadline - time.monotonic()))
+                yield _sse('seats', events) if events else ': ping\n\n'
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-store',
+        # 反向代理不缓冲，事件立即送达
+        'X-Accel-Buffering': 'no',
+    })
+
 
 @activity_bp.route('/<int:activity_id>', methods=['GET'])
+@cached_response(CACHE_TABLES)
 def get_activity(activity_id):
     try:
+        # 先只查 updated_at，客户端缓存有效时直接 304
+        row = db.session.query(Activity.updated_at).filter(Activity.id == activity_id).first()
+        if row is None:
+            return jsonify({'success': False, 'message': '活动获取失败'}), 404
+        etag = make_etag('activity', activity_id, row.updated_at)
+        if is_not_modified(etag, row.updated_at):
+            return not_modified_response(etag, row.updated_at)
+
         activity = Activity.query.get_or_404(activity_id, description='活动不存在')
-        return jsonify({'success': True, 'activity': activity.to_dict()}), 200
+        return add_validators(jsonify({'success': True, 'activity': activity.to_dict()}),
+                              etag, row.updated_at), 200
     except Exception as e:
         current_app.logger.error(f'get_activity error: {e}', exc_info=True)
         return jsonify({'success': False, 'message': '活动获取失败'}), 404
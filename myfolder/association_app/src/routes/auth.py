@@ -1,17 +1,46 @@
-from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, current_app, g, request, jsonify, session
 from src.models.user import User, db
+from src.utils import tokens, user_directory
+from src.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, read_limit
+from src.utils.passwords import HasherBusy
+from src.utils.rate_limit import rate_limited
+from src.utils.serializers import USER, json_response
 from datetime import datetime
 import functools
 
 auth_bp = Blueprint('auth', __name__)
 
+def _authenticate():
+    """识别当前用户：优先 Authorization: Bearer 访问令牌，其次会话
+
+    成功时设置 g.user_id / g.token_role 并返回 None，令牌无效时返回错误响应
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            claims = tokens.verify(header[len('Bearer '):].strip(), 'access')
+        except tokens.TokenError as e:
+            return jsonify({'success': False, 'message': str(e)}), 401
+        g.user_id = int(claims['sub'])
+        g.token_role = claims.get('role')
+        return None
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': '请先登录'}), 401
+    g.user_id = session['user_id']
+    g.token_role = None
+    return None
+
+def current_user_id():
+    """当前请求的用户 id（需在 login_required / admin_required 之后调用）"""
+    return g.get('user_id')
+
 # 装饰器：检查用户是否已登录
 def login_required(f):
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'success': False, 'message': '请先登录'}), 401
+        error = _authenticate()
+        if error:
+            return error
         return f(*args, **kwargs)
     return decorated_function
 
@@ -19,17 +48,24 @@ def login_required(f):
 def admin_required(f):
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'success': False, 'message': '请先登录'}), 401
+        error = _authenticate()
+        if error:
+            return error
         
-        user = User.query.get(session['user_id'])
-        if not user or not user.is_admin():
+        # 令牌自带角色声明，无需查库；会话方式仍以数据库中的角色为准
+        if g.token_role is not None:
+            is_admin = g.token_role == 'admin'
+        else:
+            user = User.query.get(g.user_id)
+            is_admin = bool(user and user.is_admin())
+        if not is_admin:
             return jsonify({'success': False, 'message': '需要管理员权限'}), 403
         
         return f(*args, **kwargs)
     return decorated_function
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limited('register')
 def register():
     """用户注册接口"""
     data = request.get_json()
@@ -75,29 +111,61 @@ def register():
             }
         }), 201
         
+    except HasherBusy:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': '注册人数过多，请稍后再试'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'注册失败: {str(e)}'}), 500
 
-@auth_bp.route('/login', methods=['POST'])
-def login():
-    """用户登录接口"""
-    data = request.get_json()
-    
+def _check_credentials(data):
+    """校验用户名密码，返回 (user, None) 或 (None, 错误响应)"""
     # 验证必填字段
     if not data.get('username') or not data.get('password'):
-        return jsonify({'success': False, 'message': '用户名和密码不能为空'}), 400
+        return None, (jsonify({'success': False, 'message': '用户名和密码不能为空'}), 400)
     
     # 查找用户
     user = User.query.filter_by(username=data['username']).first()
     
     # 验证用户和密码
-    if not user or not user.check_password(data['password']):
-        return jsonify({'success': False, 'message': '用户名或密码错误'}), 401
+    try:
+        if not user or not user.check_password(data['password']):
+            return None, (jsonify({'success': False, 'message': '用户名或密码错误'}), 401)
+        # 哈希参数已过时（算法或强度调整后），登录成功时透明地重新哈希
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+    except HasherBusy:
+        return None, (jsonify({'success': False, 'message': '登录人数过多，请稍后再试'}), 503)
     
-    # 更新最后登录时间
+    # 最后登录时间进入写后缓冲，热路径上不提交事务
     user.update_last_login()
     
+    # 只有重新哈希了密码时才需要提交
+    if db.session.dirty:
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"登录时更新用户数据失败: {str(e)}")
+            return None, (jsonify({'success': False, 'message': '登录过程中发生错误'}), 500)
+    return user, None
+
+def _user_summary(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'full_name': user.full_name,
+        'role': user.role
+    }
+
+@auth_bp.route('/login', methods=['POST'])
+@rate_limited('login')
+def login():
+    """用户登录接口"""
+    user, error = _check_credentials(request.get_json() or {})
+    if error:
+        return error
+    
     # 检查是否需要强制修改密码
     force_change_password = getattr(user, 'force_password_change', False)
     
@@ -108,25 +176,51 @@ def login():
     session['force_password_change'] = force_change_password
     session.permanent = True  # 使会话持久化
     
-    # 提交数据库更改
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error(f"登录时更新用户数据失败: {str(e)}")
-        return jsonify({'success': False, 'message': '登录过程中发生错误'}), 500
-    
     return jsonify({
         'success': True,
         'message': '登录成功',
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'full_name': user.full_name,
-            'role': user.role
-        }
+        'user': _user_summary(user)
     }), 200
 
+@auth_bp.route('/token', methods=['POST'])
+@rate_limited('login')
+def issue_token():
+    """令牌登录：返回访问令牌与刷新令牌"""
+    user, error = _check_credentials(request.get_json() or {})
+    if error:
+        return error
+    return jsonify({'success': True, 'user': _user_summary(user), **tokens.issue_tokens(user)}), 200
+
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    """用刷新令牌换取新令牌（轮换刷新令牌，角色取自数据库）"""
+    data = request.get_json() or {}
+    try:
+        claims = tokens.verify(data.get('refresh_token', ''), 'refresh')
+    except tokens.TokenError as e:
+        return jsonify({'success': False, 'message': str(e)}), 401
+    
+    user = User.query.get(int(claims['sub']))
+    if not user:
+        return jsonify({'success': False, 'message': '用户不存在'}), 401
+    # 轮换：旧令牌原子地吊销，并发的重复换取只有一个成功
+    if not tokens.revoke(claims):
+        return jsonify({'success': False, 'message': '令牌已失效'}), 401
+    return jsonify({'success': True, **tokens.issue_tokens(user)}), 200
+
+@auth_bp.route('/token/revoke', methods=['POST'])
+def revoke_token():
+    """吊销刷新令牌（令牌方式登出），可同时带上当前访问令牌一并吊销"""
+    data = request.get_json() or {}
+    try:
+        tokens.revoke(tokens.verify(data.get('refresh_token', ''), 'refresh'))
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            tokens.revoke(tokens.verify(header[len('Bearer '):].strip(), 'access'))
+    except tokens.TokenError as e:
+        return jsonify({'success': False, 'message': str(e)}), 401
+    return jsonify({'success': True, 'message': '已成功登出'}), 200
+
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
     """用户登出接口"""
@@ -137,7 +231,7 @@ def logout():
 @login_required
 def get_profile():
     """获取当前用户信息"""
-    user = User.query.get(session['user_id'])
+    user = User.query.get(current_user_id())
     if not user:
         session.clear()
         return jsonify({'success': False, 'message': '用户不存在'}), 404
@@ -151,7 +245,7 @@ def get_profile():
 @login_required
 def update_profile():
     """更新用户信息"""
-    user = User.query.get(session['user_id'])
+    user = User.query.get(current_user_id())
     if not user:
         session.clear()
         return jsonify({'success': False, 'message': '用户不存在'}), 404
@@ -166,7 +260,11 @@ def update_profile():
     
     # 更新密码（如果提供）
     if 'password' in data and data['password']:
-        user.set_password(data['password'])
+        try:
+            user.set_password(data['password'])
+        except HasherBusy:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '服务繁忙，请稍后再试'}), 503
     
     try:
         db.session.commit()
@@ -183,10 +281,43 @@ def update_profile():
 @admin_required
 def get_users():
     """管理员获取所有用户列表"""
-    users = User.query.all()
-    return jsonify({
+    rows = User.query.with_entities(*USER.columns()).all()
+    return json_response({
+        'success': True,
+        'users': USER.serialize(rows)
+    }), 200
+
+@auth_bp.route('/users/directory', methods=['GET'])
+@admin_required
+def search_users():
+    """管理员用户目录：q 前缀检索用户名/姓名/学号/邮箱，按院系、专业、角色过滤，键集分页"""
+    limit = read_limit(request.args, default=20, maximum=100)
+    after_id = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_id, = decode_cursor(cursor, (int,))
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': '无效的分页游标'}), 400
+    
+    query = user_directory.build_query(
+        q=request.args.get('q', '').strip(),
+        filters={name: request.args.get(name) for name in user_directory.FILTER_COLUMNS},
+        after_id=after_id
+    )
+    rows = query.with_entities(*USER.columns(), User.registration_count,
+                               User.active_registration_count).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    users = USER.serialize(rows)
+    n = len(USER.keys)
+    for ud, row in zip(users, rows):
+        ud['registration_stats'] = {'total': row[n], 'active': row[n + 1]}
+    return json_response({
         'success': True,
-        'users': [user.to_dict() for user in users]
+        'users': users,
+        'next_cursor': encode_cursor(rows[-1].id) if has_more else None
     }), 200
 
 @auth_bp.route('/users/<int:user_id>', methods=['GET'])
@@ -218,6 +349,8 @@ def update_user_role(user_id):
     
     try:
         db.session.commit()
+        # 已签发的访问令牌携带旧角色，令其失效以便在刷新间隔内生效
+        tokens.revoke_user_access(user.id)
         return jsonify({
             'success': True,
             'message': '用户角色已更新',
@@ -1,47 +1,56 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from datetime import datetime
+import os
 
 from src.models import db
 from src.models.user import User
 from src.models.activity import Activity
-from src.models.registration import Registration
 from src.routes.auth import admin_required
+from src.utils import bulk_status, dashboard_stats, export
+from src.utils.serializers import ACTIVITY, USER, json_response
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 
+# 导出格式 -> (MIME 类型, 编码器)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', lambda rows: export.iter_csv(rows, bom=True)),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', export.iter_xlsx),
+}
+
 @dashboard_bp.route('/stats', methods=['GET'])
 @admin_required
 def get_dashboard_stats():
-    """获取管理员仪表盘统计数据"""
-    total_users = User.query.count()
-    student_users = User.query.filter_by(role='student').count()
-    admin_users = User.query.filter_by(role='admin').count()
-
-    total_activities = Activity.query.count()
-    active_activities = Activity.query.filter_by(status='active').count()
-    completed_activities = Activity.query.filter_by(status='completed').count()
-    cancelled_activities = Activity.query.filter_by(status='cancelled').count()
+    """获取管理员仪表盘统计数据（共享快照，写入后失效）"""
+    return jsonify({'success': True, **dashboard_stats.get_stats()}), 200
 
-    total_reg = Registration.query.count()
-    active_reg = Registration.query.filter_by(status='registered').count()
-    cancelled_reg = Registration.query.filter_by(status='cancelled').count()
+@dashboard_bp.route('/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """当前 worker 的活动接口响应缓存命中统计"""
+    stats = current_app.extensions['response_cache'].snapshot()
+    return jsonify({'success': True, 'pid': os.getpid(), 'response_cache': stats}), 200
 
-    recent_acts = Activity.query.order_by(Activity.created_at.desc()).limit(5).all()
-    upcoming_acts = Activity.query.filter(
-        Activity.start_time > datetime.utcnow(),
-        Activity.status == 'active'
-    ).order_by(Activity.start_time).limit(5).all()
+@dashboard_bp.route('/db-stats', methods=['GET'])
+@admin_required
+def get_db_stats():
+    """当前 worker 的数据库连接池统计"""
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'profile': current_app.extensions['db_engine_profile'],
+        'pool': current_app.extensions['db_pool_metrics'].snapshot()
+    }), 200
 
+@dashboard_bp.route('/rate-limits', methods=['GET'])
+@admin_required
+def get_rate_limits():
+    """当前 worker 的登录/注册限流统计"""
+    limiter = current_app.extensions.get('rate_limiter')
     return jsonify({
         'success': True,
-        'stats': {
-            'users': {'total': total_users, 'students': student_users, 'admins': admin_users},
-            'activities': {'total': total_activities, 'active': active_activities,
-                           'completed': completed_activities, 'cancelled': cancelled_activities},
-            'registrations': {'total': total_reg, 'active': active_reg, 'cancelled': cancelled_reg}
-        },
-        'recent_activities': [act.to_dict() for act in recent_acts],
-        'upcoming_activities': [act.to_dict() for act in upcoming_acts]
+        'pid': os.getpid(),
+        'enabled': limiter is not None,
+        **(limiter.snapshot() if limiter is not None else {})
     }), 200
 
 @dashboard_bp.route('/activities', methods=['GET'])
@@ -52,15 +61,14 @@ def get_dashboard_activities():
     query = Activity.query
     if status != 'all':
         query = query.filter_by(status=status)
-    acts = query.order_by(Activity.created_at.desc()).all()
-    result = []
-    for act in acts:
-        ad = act.to_dict()
-        total = Registration.query.filter_by(activity_id=act.id).count()
-        active = Registration.query.filter_by(activity_id=act.id, status='registered').count()
-        ad['registration_stats'] = {'total': total, 'active': active}
-        result.append(ad)
-    return jsonify({'success': True, 'activities': result}), 200
+    rows = query.with_entities(*ACTIVITY.columns(), Activity.registration_count,
+                               Activity.active_registration_count) \
+                .order_by(Activity.created_at.desc()).all()
+    result = ACTIVITY.serialize(rows)
+    n = len(ACTIVITY.keys)
+    for ad, row in zip(result, rows):
+        ad['registration_stats'] = {'total': row[n], 'active': row[n + 1]}
+    return json_response({'success': True, 'activities': result}), 200
 
 @dashboard_bp.route('/users', methods=['GET'])
 @admin_required
@@ -70,50 +78,76 @@ def get_dashboard_users():
     query = User.query
     if role != 'all':
         query = query.filter_by(role=role)
-    users = query.order_by(User.created_at.desc()).all()
-    result = []
-    for u in users:
-        ud = u.to_dict()
-        total = Registration.query.filter_by(user_id=u.id).count()
-        active = Registration.query.filter_by(user_id=u.id, status='registered').count()
-        ud['registration_stats'] = {'total': total, 'active': active}
-        result.append(ud)
-    return jsonify({'success': True, 'users': result}), 200
+    rows = query.with_entities(*USER.columns(), User.registration_count,
+                               User.active_registration_count) \
+                .order_by(User.created_at.desc()).all()
+    result = USER.serialize(rows)
+    n = len(USER.keys)
+    for ud, row in zip(result, rows):
+        ud['registration_stats'] = {'total': row[n], 'active': row[n + 1]}
+    return json_response({'success': True, 'users': result}), 200
 
 @dashboard_bp.route('/export/participants/<int:activity_id>', methods=['GET'])
 @admin_required
 def export_participants(activity_id):
-    """导出活动参与者 CSV 数据"""
+    """导出活动参与者 CSV 数据（JSON 包装，供前端直接处理）"""
     act = Activity.query.get(activity_id)
     if not act:
         return jsonify({'success': False, 'message': '活动不存在'}), 404
-    regs = Registration.query.filter_by(activity_id=activity_id).all()
-    csv = '序号,用户名,姓名,学号,院系,专业,电话,邮箱,报名时间,状态,备注\n'
-    for i, r in enumerate(regs, 1):
-        u = User.query.get(r.user_id)
-        row = [str(i), u.username, u.full_name, u.student_id or '', u.department or '',
-               u.major or '', u.phone or '', u.email, r.registration_time.strftime('%Y-%m-%d %H:%M:%S'),
-               r.status, r.notes or '']
-        # 处理双引号和逗号
-        row = ['"'+f.replace('"','""')+'"' if ',' in f or '"' in f else f for f in row]
-        csv += ','.join(row) + '\n'
+    csv_data = ''.join(export.iter_csv(export.participant_rows(activity_id)))
     filename = f"participants_{activity_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
-    return jsonify({'success': True, 'activity': act.to_dict(), 'filename': filename, 'csv_data': csv}), 200
+    return jsonify({'success': True, 'activity': act.to_dict(), 'filename': filename, 'csv_data': csv_data}), 200
+
+@dashboard_bp.route('/export/participants/<int:activity_id>/download', methods=['GET'])
+@admin_required
+def download_participants(activity_id):
+    """流式下载活动参与者文件，format=csv（默认）或 xlsx"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': '不支持的导出格式'}), 400
+    if not db.session.query(Activity.id).filter_by(id=activity_id).first():
+        return jsonify({'success': False, 'message': '活动不存在'}), 404
+
+    mimetype, encoder = EXPORT_FORMATS[fmt]
+    filename = f"participants_{activity_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    body = encoder(export.participant_rows(activity_id))
+    # 不设 Content-Length，由服务器分块传输；X-Accel-Buffering 关闭 nginx 缓冲
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',
+    })
 
 @dashboard_bp.route('/registrations/update-status', methods=['POST'])
 @admin_required
 def update_registration_status():
-    """批量更新报名状态"""
+    """按报名 ID 批量更新报名状态"""
     data = request.get_json() or {}
     ids = data.get('registrations', [])
     new_status = data.get('status')
-    if not isinstance(ids, list) or new_status not in ['registered','cancelled','attended']:
+    if not isinstance(ids, list) or new_status not in bulk_status.VALID_STATUSES:
+        return jsonify({'success': False, 'message': '无效请求'}), 400
+    try:
+        updated, by_status, not_found = bulk_status.update_by_ids(ids, new_status)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '无效的报名 ID'}), 400
+    except bulk_status.BulkUpdateConflict:
+        return jsonify({'success': False, 'message': '报名状态已被修改，请刷新后重试'}), 409
+    return jsonify({'success': True, 'updated_count': updated,
+                    'status_counts': by_status, 'not_found': not_found}), 200
+
+@dashboard_bp.route('/registrations/update-status-by-filter', methods=['POST'])
+@admin_required
+def update_registration_status_by_filter():
+    """按条件批量更新报名状态，如把某活动所有已报名记录标记为已参加"""
+    data = request.get_json() or {}
+    activity_id = data.get('activity_id')
+    from_status = data.get('from_status')
+    new_status = data.get('status')
+    if not isinstance(activity_id, int) or new_status not in bulk_status.VALID_STATUSES \
+            or (from_status is not None and from_status not in bulk_status.VALID_STATUSES):
         return jsonify({'success': False, 'message': '无效请求'}), 400
-    updated = 0
-    for rid in ids:
-        r = Registration.query.get(rid)
-        if r:
-            r.status = new_status
-            updated += 1
-    db.session.commit()
-    return jsonify({'success': True, 'updated_count': updated}), 200
+    try:
+        updated, by_status = bulk_status.update_by_filter(new_status, activity_id, from_status)
+    except bulk_status.BulkUpdateConflict:
+        return jsonify({'success': False, 'message': '报名状态已被修改，请刷新后重试'}), 409
+    return jsonify({'success': True, 'updated_count': updated, 'status_counts': by_status}), 200
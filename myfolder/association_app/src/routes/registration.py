@@ -1,11 +1,15 @@
-from flask import Blueprint, request, jsonify, session, abort
+from flask import Blueprint, request, jsonify, abort
 from datetime import datetime
 
 from src.models import db
 from src.models.activity import Activity
 from src.models.registration import Registration
 from src.models.user import User
-from src.routes.auth import login_required
+from src.routes.auth import current_user_id, login_required
+from src.utils import seats
+from src.utils.admission import admission_required
+from src.utils.pagination import InvalidCursor, after_desc, decode_cursor, encode_cursor, read_limit
+from src.utils.serializers import ACTIVITY, REGISTRATION, json_response
 
 # 正确创建 Blueprint，名字和模块名对应
 registration_bp = Blueprint('registration', __name__)
@@ -13,43 +17,22 @@ registration_bp = Blueprint('registration', __name__)
 # 用户报名活动
 @registration_bp.route('/activities/<int:activity_id>/register', methods=['POST'])
 @login_required
+@admission_required
 def register_activity(activity_id):
-    user_id = session.get('user_id')
+    user_id = current_user_id()
     user = User.query.get(user_id)
     if not user:
         return jsonify({'success': False, 'message': '用户不存在'}), 404
 
-    activity = Activity.query.get(activity_id)
-    if not activity or activity.is_deleted:
-        return jsonify({'success': False, 'message': '活动不存在'}), 404
-
-    # 检查报名截止和活动状态
-    if activity.registration_deadline < datetime.utcnow() or activity.status != 'active':
-        return jsonify({'success': False, 'message': '活动报名已截止或已取消'}), 400
-
-    # 检查是否已满
-    if activity.max_participants and activity.registrations.count() >= activity.max_participants:
-        return jsonify({'success': False, 'message': '活动名额已满'}), 400
-
-    # 检查是否已报名
-    existing = Registration.query.filter_by(user_id=user_id, activity_id=activity_id).first()
-    if existing:
-        return jsonify({'success': False, 'message': '您已报名此活动'}), 400
-
     data = request.get_json() or {}
     notes = data.get('notes', '')
 
-    reg = Registration(
-        user_id=user_id,
-        activity_id=activity_id,
-        registration_time=datetime.utcnow(),
-        status='pending',
-        notes=notes
-    )
+    # 条件 UPDATE 抢占名额 + 唯一约束防重复报名，同一事务内完成
     try:
-        db.session.add(reg)
-        db.session.commit()
+        reg = seats.reserve(user_id, activity_id, notes=notes)
         return jsonify({'success': True, 'message': '报名成功', 'registration': reg.to_dict()}), 201
+    except seats.SeatReservationError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'报名失败: {e}'}), 500
@@ -58,11 +41,7 @@ def register_activity(activity_id):
 @registration_bp.route('/activities/<int:activity_id>/cancel', methods=['POST'])
 @login_required
 def cancel_registration(activity_id):
-    user_id = session.get('user_id')
-    reg = Registration.query.filter_by(user_id=user_id, activity_id=activity_id).first()
-    if not reg:
-        return jsonify({'success': False, 'message': '您未报名此活动'}), 404
-
+    user_id = current_user_id()
     activity = Activity.query.get(activity_id)
     if not activity:
         return jsonify({'success': False, 'message': '活动不存在'}), 404
@@ -71,39 +50,97 @@ def cancel_registration(activity_id):
         return jsonify({'success': False, 'message': '活动已开始，无法取消报名'}), 400
 
     try:
-        reg.status = 'cancelled'
+        if not seats.release(user_id, activity_id):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '您未报名此活动'}), 404
         db.session.commit()
         return jsonify({'success': True, 'message': '已取消报名'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'取消报名失败: {e}'}), 500
 
-# 获取当前用户的所有报名记录
+# fields= 投影允许的字段，形如 fields=registration.status,activity.title
+PROJECTABLE_FIELDS = {
+    'registration': {'id', 'user_id', 'activity_id', 'registration_time', 'status', 'notes'},
+    'activity': {'id', 'title', 'description', 'location', 'start_time', 'end_time',
+                 'registration_deadline', 'max_participants', 'seats_remaining', 'status',
+                 'image_url', 'image_srcset', 'created_at', 'updated_at'},
+}
+
+
+def _parse_fields(raw):
+    """解析 fields 参数，返回 {分组: 字段集合}；未指定时返回 None 表示全部字段"""
+    if not raw:
+        return None
+    wanted = {group: set() for group in PROJECTABLE_FIELDS}
+    for item in raw.split(','):
+        group, _, name = item.strip().partition('.')
+        if name not in PROJECTABLE_FIELDS.get(group, ()):
+            raise ValueError(item)
+        wanted[group].add(name)
+    return wanted
+
+
+# 获取当前用户的所有报名记录（键集分页，一条 JOIN 查询）
 @registration_bp.route('/my-registrations', methods=['GET'])
 @login_required
 def get_my_registrations():
-    user_id = session.get('user_id')
+    user_id = current_user_id()
     status = request.args.get('status', 'all')
-    query = Registration.query.filter_by(user_id=user_id)
+    limit = read_limit(request.args, default=50, maximum=200)
+    try:
+        fields = _parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'无效的字段: {e}'}), 400
+
+    # 只查询要输出的列（fields 指定时更少），外加两列游标键
+    reg_keys = REGISTRATION.keys if fields is None else \
+        [k for k in REGISTRATION.keys if k in fields['registration']]
+    act_keys = ACTIVITY.keys if fields is None else \
+        [k for k in ACTIVITY.keys if k in fields['activity']]
+    query = db.session.query(*REGISTRATION.columns(reg_keys, prefix='r_'),
+                             *ACTIVITY.columns(act_keys, prefix='a_'),
+                             Registration.registration_time.label('cursor_time'),
+                             Registration.id.label('cursor_id')) \
+        .select_from(Registration) \
+        .join(Activity, Activity.id == Registration.activity_id) \
+        .filter(Registration.user_id == user_id)
     if status != 'all':
-        query = query.filter_by(status=status)
-    regs = query.order_by(Registration.registration_time.desc()).all()
-
-    result = []
-    for r in regs:
-        act = Activity.query.get(r.activity_id)
-        if act:
-            result.append({
-                'registration': r.to_dict(),
-                'activity': act.to_dict()
-            })
-    return jsonify({'success': True, 'registrations': result}), 200
+        query = query.filter(Registration.status == status)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_time, last_id = decode_cursor(cursor, (datetime, int))
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': '无效的分页游标'}), 400
+        query = query.filter(after_desc(Registration.registration_time, Registration.id,
+                                        last_time, last_id))
+
+    # 多取一行用于判断是否还有下一页
+    rows = query.order_by(Registration.registration_time.desc(), Registration.id.desc()) \
+                .limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # 未请求任何字段的分组不输出
+    groups = [(group, projection.serialize(rows, keys, start))
+              for group, keys, projection, start in (
+                  ('registration', reg_keys, REGISTRATION, 0),
+                  ('activity', act_keys, ACTIVITY, len(reg_keys)))
+              if keys]
+    result = [{group: items[i] for group, items in groups} for i in range(len(rows))]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].cursor_time, rows[-1].cursor_id)
+    return json_response({'success': True, 'registrations': result, 'next_cursor': next_cursor}), 200
 
 # 检查当前用户对指定活动的报名状态
 @registration_bp.route('/activities/<int:activity_id>/status', methods=['GET'])
 @login_required
 def check_registration_status(activity_id):
-    user_id = session.get('user_id')
+    user_id = current_user_id()
     activity = Activity.query.get(activity_id)
     if not activity:
         return jsonify({'success': False, 'message': '活动不存在'}), 404
@@ -1,26 +1,40 @@
 from flask import Blueprint, request, jsonify, current_app
-from werkzeug.utils import secure_filename
-import os, uuid
+from concurrent.futures import TimeoutError as FutureTimeout
+from src.models import db
+from src.models.image import UploadedImage
+from src.utils import images
 
 upload_bp = Blueprint('upload', __name__, url_prefix='/api/upload')
 
-ALLOWED_EXT = {'png','jpg','jpeg','gif'}
+ALLOWED_EXT = images.ALLOWED_EXT
 
 def allowed_file(fn): return '.' in fn and fn.rsplit('.',1)[1].lower() in ALLOWED_EXT
 
 @upload_bp.route('/image', methods=['POST'])
 def upload_image():
-    """上传图片"""
+    """上传图片：按内容哈希存储，后台生成多尺寸变体"""
     file = request.files.get('file')
     if not file or file.filename=='':
         return jsonify({'success':False,'message':'未选择文件'}),400
     if not allowed_file(file.filename):
         return jsonify({'success':False,'message':'不支持的文件类型'}),400
-    fn = secure_filename(file.filename)
-    unique = f"{uuid.uuid4().hex}_{fn}"
-    folder = os.path.join(current_app.static_folder,'uploads')
-    os.makedirs(folder,exist_ok=True)
-    path = os.path.join(folder,unique)
-    file.save(path)
-    url = f"/static/uploads/{unique}"
-    return jsonify({'success':True,'file_url':url}),200
+    try:
+        record, future = images.store_upload(file)
+    except images.InvalidImage:
+        return jsonify({'success':False,'message':'无法识别的图片文件'}),400
+    # 变体通常很快生成完，短暂等待以便直接返回各尺寸节省的字节数；超时则稍后查询
+    if future is not None:
+        try:
+            future.result(timeout=current_app.config['IMAGE_RESPONSE_WAIT'])
+        except FutureTimeout:
+            pass
+        db.session.refresh(record)
+    return jsonify({'success':True,'file_url':record.url,'image':record.to_dict()}),200
+
+@upload_bp.route('/image/<content_hash>', methods=['GET'])
+def get_image(content_hash):
+    """查询图片变体的生成状态"""
+    record = UploadedImage.query.filter_by(content_hash=content_hash).first()
+    if not record:
+        return jsonify({'success':False,'message':'图片不存在'}),404
+    return jsonify({'success':True,'image':record.to_dict()}),200
@@ -81,6 +81,7 @@ const Activities = {
         <ul class="list-group">
             <li v-for="act in activities" :key="act.id" class="list-group-item">
                 <strong>{{ act.title }}</strong>
+                <span v-if="act.seats_remaining !== null" class="badge bg-secondary ms-2">剩余 {{ act.seats_remaining }} 个名额</span>
                 <button class="btn btn-sm btn-success float-end" @click="signUp(act.id)">报名</button>
                 <p>{{ act.description }}</p>
             </li>
@@ -88,7 +89,10 @@ const Activities = {
     </div>`,
     data() {
         return {
-            activities: []
+            activities: [],
+            seatStream: null,
+            seatPoll: null,
+            closed: false
         };
     },
     async created() {
@@ -96,18 +100,77 @@ const Activities = {
             const resp = await axios.get('/api/activities');
             // 后端返回 { success, activities: [...], ... }
             this.activities = resp.data.activities;
+            this.watchSeats();
         } catch(e) {
             console.error('获取活动列表失败', e);
         }
     },
+    unmounted() {
+        if (this.seatStream) {
+            this.seatStream.close();
+        }
+        this.closed = true;
+        clearTimeout(this.seatPoll);
+    },
     methods: {
-        async signUp(id) {
+        applySeats(updates) {
+            for (const update of updates) {
+                const act = this.activities.find(a => a.id === update.id);
+                if (act) {
+                    Object.assign(act, update);
+                }
+            }
+        },
+        // 名额变化由服务端推送，无需刷新页面
+        watchSeats() {
+            if (!this.activities.length) {
+                return;
+            }
+            const ids = this.activities.map(act => act.id).join(',');
+            if (!window.EventSource) {
+                this.pollSeats(ids);
+                return;
+            }
+            this.seatStream = new EventSource(`/api/activities/seats/stream?ids=${ids}`);
+            const apply = (e) => this.applySeats(JSON.parse(e.data));
+            this.seatStream.addEventListener('snapshot', apply);
+            this.seatStream.addEventListener('seats', apply);
+            // 推送不可用或连接数已满（503）时浏览器不再重连，改为轮询
+            this.seatStream.onerror = () => {
+                if (this.seatStream.readyState === EventSource.CLOSED) {
+                    this.seatStream = null;
+                    this.pollSeats(ids);
+                }
+            };
+        },
+        async pollSeats(ids) {
+            let delay = 15;
+            try {
+                const resp = await axios.get('/api/activities/seats', { params: { ids } });
+                this.applySeats(resp.data.seats);
+                delay = resp.data.poll_after || delay;
+            } catch(e) {
+                console.error('获取名额失败', e);
+            }
+            if (!this.closed) {
+                this.seatPoll = setTimeout(() => this.pollSeats(ids), delay * 1000);
+            }
+        },
+        async signUp(id, ticket = null) {
             try {
                 // 对应后端 /api/registration/activities/:id/register
-                await axios.post(`/api/registration/activities/${id}/register`);
+                const headers = ticket ? { 'X-Queue-Ticket': ticket } : {};
+                await axios.post(`/api/registration/activities/${id}/register`, {}, { headers });
                 alert('报名成功');
             } catch(e) {
-                alert('报名失败');
+                const data = e.response && e.response.data;
+                // 429：正在排队，按服务端给出的时间带凭证重试
+                if (e.response && e.response.status === 429 && data && data.queued) {
+                    this.$root.showToast('排队中', data.message, 'warning');
+                    setTimeout(() => this.signUp(id, data.ticket), data.retry_after * 1000);
+                    return;
+                }
+                alert((data && data.message) || '报名失败');
             }
         }
     }
@@ -124,20 +187,35 @@ const MyRegistrations = {
                 <br>时间: {{ item.registration.registration_time || item.registration.timestamp }}
             </li>
         </ul>
+        <button v-if="nextCursor" class="btn btn-outline-secondary mt-3" :disabled="loading" @click="load">
+            {{ loading ? '加载中...' : '加载更多' }}
+        </button>
     </div>`,
     data() {
         return {
-            regs: []
+            regs: [],
+            nextCursor: null,
+            loading: false
         };
     },
-    async created() {
-        try {
-            // 对应后端 /api/registration/my-registrations
-            const resp = await axios.get('/api/registration/my-registrations');
-            // 后端返回 { success, registrations: [ { registration, activity }, ... ] }
-            this.regs = resp.data.registrations;
-        } catch(e) {
-            console.error('获取报名记录失败', e);
+    created() {
+        this.load();
+    },
+    methods: {
+        async load() {
+            this.loading = true;
+            try {
+                // 对应后端 /api/registration/my-registrations，按 next_cursor 分页
+                const params = this.nextCursor ? { cursor: this.nextCursor } : {};
+                const resp = await axios.get('/api/registration/my-registrations', { params });
+                // 后端返回 { success, registrations: [ { registration, activity }, ... ], next_cursor }
+                this.regs = this.regs.concat(resp.data.registrations);
+                this.nextCursor = resp.data.next_cursor;
+            } catch(e) {
+                console.error('获取报名记录失败', e);
+            } finally {
+                this.loading = false;
+            }
         }
     }
 };
@@ -0,0 +1,241 @@
+"""活动全文检索
+
+索引覆盖标题、描述、地点，按数据库选择实现：
+- SQLite：FTS5 虚拟表 activities_fts（rowid 即活动 id），bm25 排序；
+- PostgreSQL：activity_search 表的 tsvector 列 + GIN 索引，ts_rank 排序；
+- 其他数据库或 SQLite 未编译 FTS5 时退回 LIKE 子串匹配，按开始时间排序。
+
+中文没有空格分词，查询切成字符二元组（"社团活动" -> 社团 团活 活动），入库时另外
+收录单字，使单字查询（"动"）能命中出现在任意位置的该字；英文与数字按词小写。
+查询的各词之间为 AND，最后一个英文词按前缀匹配。
+
+通过 ORM 新增、修改（标题/描述/地点）、删除活动时，after_flush 钩子在同一事务内
+同步索引；索引与活动表不一致时运行 `flask rebuild-search-index`。
+"""
+import re
+
+from flask import current_app, has_app_context
+from sqlalchemy import (Column, Index, Integer, MetaData, Table, column, event, func, inspect,
+                        literal_column, or_, select, table, text)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from src.models import db
+from src.models.activity import Activity
+from src.utils.serializers import ACTIVITY
+
+INDEXED_FIELDS = ('title', 'description', 'location')
+# 标题、描述、地点的权重
+FTS_WEIGHTS = (5.0, 1.0, 2.0)
+PG_WEIGHTS = ('A', 'C', 'B')
+
+activities = Activity.__table__
+
+# SQLite FTS5 虚拟表（DDL 见 create_index）
+fts = table('activities_fts', column('rowid'), *(column(name) for name in INDEXED_FIELDS))
+
+_pg_meta = MetaData()
+pg_search = Table(
+    'activity_search', _pg_meta,
+    Column('activity_id', Integer, primary_key=True),
+    Column('document', TSVECTOR, nullable=False),
+    Index('ix_activity_search_document', 'document', postgresql_using='gin'),
+)
+
+_TOKEN_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[0-9A-Za-z]+')
+
+
+def _is_cjk(ch):
+    return not ch.isascii()
+
+
+def tokenize(text, unigrams=False):
+    """切词：连续汉字切成二元组（单字保留单字，unigrams=True 时另外收录每个单字），
+    英文与数字按词小写"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ''):
+        if _is_cjk(run[0]):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                if unigrams:
+                    tokens.extend(run)
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+def _document(values):
+    return {name: ' '.join(tokenize(values.get(name), unigrams=True)) for name in INDEXED_FIELDS}
+
+
+def _query_terms(q):
+    """返回 [(词, 是否前缀匹配)]，去重并保持顺序；单个汉字按整词匹配索引中的单字"""
+    tokens = list(dict.fromkeys(tokenize(q)))
+    terms = []
+    for i, tok in enumerate(tokens):
+        prefix = i == len(tokens) - 1 and tok.isascii()
+        terms.append((tok, prefix))
+    return terms
+
+
+def fts_query(q):
+    """FTS5 MATCH 表达式，各词加引号避免被当作语法"""
+    return ' '.join(f'"{tok}"*' if prefix else f'"{tok}"' for tok, prefix in _query_terms(q))
+
+
+def tsquery(q):
+    """to_tsquery 表达式（词只含字母数字与汉字，无需转义）"""
+    return ' & '.join(f'{tok}:*' if prefix else tok for tok, prefix in _query_terms(q))
+
+
+def detect_backend(conn):
+    name = conn.dialect.name
+    if name == 'sqlite' and inspect(conn).has_table('activities_fts'):
+        return 'fts5'
+    if name == 'postgresql' and inspect(conn).has_table('activity_search'):
+        return 'tsvector'
+    return 'like'
+
+
+def create_index(conn):
+    """创建索引表，返回是否可用（SQLite 未编译 FTS5 时返回 False）"""
+    if conn.dialect.name == 'sqlite':
+        try:
+            with conn.begin_nested():
+                conn.exec_driver_sql(
+                    'CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts '
+                    f"USING fts5({', '.join(INDEXED_FIELDS)}, tokenize='unicode61')")
+        except DBAPIError:
+            return False
+        return True
+    if conn.dialect.name == 'postgresql':
+        pg_search.create(conn, checkfirst=True)
+        return True
+    return False
+
+
+def _pg_document(doc):
+    parts = [func.setweight(func.to_tsvector('simple', doc[name]), weight)
+             for name, weight in zip(INDEXED_FIELDS, PG_WEIGHTS)]
+    document = parts[0]
+    for part in parts[1:]:
+        document = document.op('||')(part)
+    return document
+
+
+def _delete(conn, backend, ids):
+    if backend == 'fts5':
+        conn.execute(fts.delete().where(fts.c.rowid.in_(ids)))
+    else:
+        conn.execute(pg_search.delete().where(pg_search.c.activity_id.in_(ids)))
+
+
+def _insert(conn, backend, rows):
+    """rows: [(活动 id, {字段: 原文})]"""
+    for activity_id, values in rows:
+        doc = _document(values)
+        if backend == 'fts5':
+            conn.execute(fts.insert().values(rowid=activity_id, **doc))
+        else:
+            conn.execute(pg_search.insert().values(activity_id=activity_id, document=_pg_document(doc)))
+
+
+def reindex(conn, backend, rows, deleted_ids=()):
+    """更新指定活动的索引：先删后插"""
+    ids = [activity_id for activity_id, _ in rows] + list(deleted_ids)
+    if backend == 'like' or not ids:
+        return
+    _delete(conn, backend, ids)
+    _insert(conn, backend, rows)
+
+
+def rebuild(conn, backend, batch=1000):
+    """清空并按活动表重建索引，返回索引的活动数"""
+    if backend == 'like':
+        return 0
+    conn.execute(fts.delete() if backend == 'fts5' else pg_search.delete())
+    total = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(activities.c.id, *(activities.c[name] for name in INDEXED_FIELDS))
+            .where(activities.c.id > last_id).order_by(activities.c.id).limit(batch)
+        ).all()
+        if not rows:
+            return total
+        _insert(conn, backend, [(row.id, row._mapping) for row in rows])
+        total += len(rows)
+        last_id = rows[-1].id
+
+
+def search_query(backend, q, start_from=None, start_to=None, status=None):
+    """返回 SELECT（活动投影列 + score 列），已按相关度排序"""
+    columns = ACTIVITY.columns()
+    if backend == 'fts5':
+        rank = func.bm25(literal_column('activities_fts'), *FTS_WEIGHTS)
+        stmt = select(*columns, (-rank).label('score')) \
+            .select_from(fts.join(activities, activities.c.id == fts.c.rowid)) \
+            .where(text('activities_fts MATCH :match').bindparams(match=fts_query(q))) \
+            .order_by(rank)
+    elif backend == 'tsvector':
+        query = func.to_tsquery('simple', tsquery(q))
+        rank = func.ts_rank(pg_search.c.document, query)
+        stmt = select(*columns, rank.label('score')) \
+            .select_from(pg_search.join(activities, activities.c.id == pg_search.c.activity_id)) \
+            .where(pg_search.c.document.op('@@')(query)) \
+            .order_by(rank.desc())
+    else:
+        # 转义通配符，用户输入的 % 或 _ 按字面匹配
+        escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'%{escaped}%'
+        stmt = select(*columns, literal_column('0').label('score')) \
+            .where(or_(*(activities.c[name].like(pattern, escape='\\') for name in INDEXED_FIELDS))) \
+            .order_by(activities.c.start_time)
+    if start_from is not None:
+        stmt = stmt.where(activities.c.start_time >= start_from)
+    if start_to is not None:
+        stmt = stmt.where(activities.c.start_time < start_to)
+    if status:
+        stmt = stmt.where(activities.c.status == status)
+    return stmt.order_by(activities.c.id.desc())
+
+
+def has_terms(q):
+    return bool(tokenize(q))
+
+
+def current_backend():
+    return current_app.extensions.get('activity_search', 'like') if has_app_context() else 'like'
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_activity_index(session, flush_context):
+    """ORM 层的活动写入在 flush 后于同一连接上同步索引"""
+    backend = current_backend()
+    if backend == 'like':
+        return
+    rows, deleted = [], []
+    for obj in session.new:
+        if isinstance(obj, Activity):
+            rows.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Activity):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in INDEXED_FIELDS):
+                rows.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Activity):
+            deleted.append(obj.id)
+    if rows or deleted:
+        reindex(session.connection(), backend,
+                [(obj.id, {name: getattr(obj, name) for name in INDEXED_FIELDS}) for obj in rows],
+                deleted)
+
+
+def init_app(app):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            app.extensions['activity_search'] = detect_backend(conn)
@@ -0,0 +1,123 @@
+"""报名候场：热门活动开放报名时的准入控制
+
+热门活动开放瞬间大量报名请求涌入，若全部直接进入写事务，worker 会被占满，
+登录、活动列表等无关接口随之超时。报名接口因此先经过两道关口：
+
+- 按活动排队：每个请求领取一个号（签名后的候场凭证，绑定用户与活动），放行位置
+  按 REGISTRATION_ADMIT_RATE（个/秒）前移，空闲时可立即放行 REGISTRATION_ADMIT_BURST 个。
+  未轮到的请求立即返回 429，带排队位置、Retry-After 与凭证，客户端到时带凭证重试，
+  不占用 worker 等待。计数保存在共享状态中，各 worker 共用一条队列；
+- 写入并发预算：每个 worker 同时执行的报名写事务不超过 REGISTRATION_CONCURRENCY，
+  超出的请求保留凭证稍后重试，其余线程留给无关接口。
+
+活动不存在、已截止/取消或名额已满时直接拒绝，不领号；超过 REGISTRATION_TICKET_TTL
+未推进的队列（其中的凭证都已过期）定期从共享状态中删除。
+
+共享状态不可用时直接放行，退化为不排队。
+"""
+import functools
+import math
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app, g, jsonify, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from src.utils import seats
+
+TICKET_HEADER = 'X-Queue-Ticket'
+# 已放行但写入预算已满时建议的重试间隔（秒）
+BUSY_RETRY_AFTER = 0.5
+
+Decision = namedtuple('Decision', 'admitted ticket position retry_after')
+
+
+class AdmissionController:
+    """每个 worker 一个：签发/校验候场凭证，维护本 worker 的写入并发预算"""
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = app.config['REGISTRATION_ADMISSION']
+        self.rate = app.config['REGISTRATION_ADMIT_RATE']
+        self.burst = app.config['REGISTRATION_ADMIT_BURST']
+        self.ticket_ttl = app.config['REGISTRATION_TICKET_TTL']
+        self.budget = threading.BoundedSemaphore(app.config['REGISTRATION_CONCURRENCY'])
+        self._serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='registration-queue')
+        self._last_purge = time.monotonic()
+
+    def _read_ticket(self, token, activity_id, user_id):
+        """解析凭证，返回号码；无效、过期或不属于该用户与活动时返回 None"""
+        if not token:
+            return None
+        try:
+            data = self._serializer.loads(token, max_age=self.ticket_ttl)
+        except BadSignature:
+            return None
+        if data.get('a') != activity_id or data.get('u') != user_id:
+            return None
+        return data.get('n')
+
+    def admit(self, activity_id, user_id, token=None):
+        """判断请求能否进入报名写入，返回 Decision"""
+        number = self._read_ticket(token, activity_id, user_id)
+        state = self.app.extensions['shared_state']
+        if time.monotonic() - self._last_purge > self.ticket_ttl:
+            self._last_purge = time.monotonic()
+            state.purge_queues(self.ticket_ttl)
+        result = state.advance_queue(
+            f'registration:{activity_id}', self.rate, self.burst, take=number is None)
+        if result is None:
+            return Decision(True, None, 0, 0)
+        issued, admitted = result
+        if number is None:
+            number = issued
+            token = self._serializer.dumps({'a': activity_id, 'u': user_id, 'n': number})
+        position = number - math.floor(admitted)
+        if position <= 0:
+            return Decision(True, token, 0, 0)
+        return Decision(False, token, position, position / self.rate)
+
+
+def _queued_response(decision, message):
+    response = jsonify({
+        'success': False,
+        'queued': True,
+        'message': message,
+        'queue_position': decision.position,
+        'retry_after': round(decision.retry_after, 2),
+        'ticket': decision.ticket,
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(decision.retry_after)))
+    if decision.ticket:
+        response.headers[TICKET_HEADER] = decision.ticket
+    return response
+
+
+def admission_required(f):
+    """报名接口的准入控制，需放在 login_required 之后（凭证绑定 g.user_id）"""
+    @functools.wraps(f)
+    def decorated_function(activity_id, *args, **kwargs):
+        controller = current_app.extensions['admission']
+        if not controller.enabled:
+            return f(activity_id, *args, **kwargs)
+        # 先确认活动可报名再领号，无效的活动 id 不会在共享状态里留下队列
+        error = seats.check_open(activity_id)
+        if error:
+            return jsonify({'success': False, 'message': error.message}), error.status_code
+        decision = controller.admit(activity_id, g.get('user_id'), request.headers.get(TICKET_HEADER))
+        if not decision.admitted:
+            return _queued_response(decision, f'报名人数较多，您前面还有 {decision.position} 人，请稍候')
+        if not controller.budget.acquire(blocking=False):
+            return _queued_response(decision._replace(retry_after=BUSY_RETRY_AFTER),
+                                    '报名人数较多，请稍候')
+        try:
+            return f(activity_id, *args, **kwargs)
+        finally:
+            controller.budget.release()
+    return decorated_function
+
+
+def init_app(app):
+    app.extensions['admission'] = AdmissionController(app)
@@ -0,0 +1,128 @@
+"""报名状态批量更新
+
+按 ID 列表更新时分块执行 SELECT ... WHERE id IN (...) 与
+UPDATE ... WHERE id IN (...)；按条件更新时全部是集合操作，客户端无需上传 ID。
+两种方式都在同一事务内同步剩余名额与报名计数，并返回按原状态统计的更新数量。
+"""
+from collections import Counter, defaultdict
+
+from sqlalchemy import and_, func, select
+
+from src.models import db
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.models.user import User
+from src.utils import counters, seats
+
+VALID_STATUSES = ('registered', 'cancelled', 'attended')
+# 每条 IN (...) 最多携带的 ID 数，避开 SQLite 的参数个数上限
+CHUNK_SIZE = 500
+
+registrations = Registration.__table__
+
+
+class BulkUpdateConflict(Exception):
+    """更新期间报名状态被并发修改"""
+
+
+def _active_delta(old_status, new_status):
+    return (new_status == counters.ACTIVE_STATUS) - (old_status == counters.ACTIVE_STATUS)
+
+
+def _apply_side_effects(activity_counts, user_deltas, new_status):
+    """activity_counts: {(原状态, 活动 id): 数量}；user_deltas: {用户 id: 有效报名增量}"""
+    seat_deltas = defaultdict(int)
+    activity_deltas = defaultdict(int)
+    for (old_status, activity_id), count in activity_counts.items():
+        seat_deltas[activity_id] += seats.seat_delta(old_status, new_status) * count
+        activity_deltas[activity_id] += _active_delta(old_status, new_status) * count
+    seats.adjust_seats_bulk(seat_deltas)
+    counters.apply_active_deltas(Activity.__table__, activity_deltas)
+    counters.apply_active_deltas(User.__table__, user_deltas)
+
+
+def _update_where(condition, old_status, new_status, expected):
+    """以原状态为条件更新，行数不符说明有并发修改"""
+    result = db.session.execute(
+        registrations.update()
+        .where(and_(condition, registrations.c.status == old_status))
+        .values(status=new_status)
+    )
+    if result.rowcount != expected:
+        raise BulkUpdateConflict()
+
+
+def update_by_ids(ids, new_status):
+    """按报名 ID 批量更新状态并提交，返回 (更新数, {原状态: 数量}, 未找到的 ID)"""
+    wanted = list(dict.fromkeys(int(i) for i in ids))
+    by_status = Counter()
+    not_found = []
+    try:
+        for start in range(0, len(wanted), CHUNK_SIZE):
+            chunk = wanted[start:start + CHUNK_SIZE]
+            rows = db.session.execute(
+                select(registrations.c.id, registrations.c.user_id,
+                       registrations.c.activity_id, registrations.c.status)
+                .where(registrations.c.id.in_(chunk))
+            ).all()
+            found = {row.id for row in rows}
+            not_found.extend(i for i in chunk if i not in found)
+
+            groups = defaultdict(list)
+            activity_counts = Counter()
+            user_deltas = defaultdict(int)
+            for row in rows:
+                if row.status == new_status:
+                    continue
+                groups[row.status].append(row.id)
+                activity_counts[(row.status, row.activity_id)] += 1
+                user_deltas[row.user_id] += _active_delta(row.status, new_status)
+
+            for old_status, group_ids in groups.items():
+                _update_where(registrations.c.id.in_(group_ids), old_status, new_status, len(group_ids))
+                by_status[old_status] += len(group_ids)
+            _apply_side_effects(activity_counts, user_deltas, new_status)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return sum(by_status.values()), dict(by_status), not_found
+
+
+def update_by_filter(new_status, activity_id, from_status=None):
+    """把某活动下（可限定原状态）的报名批量改为 new_status 并提交
+
+    返回 (更新数, {原状态: 数量})。用户计数用 UPDATE ... WHERE id IN (子查询) 同步，
+    不把报名行取回应用层。
+    """
+    condition = registrations.c.activity_id == activity_id
+    if from_status:
+        condition = and_(condition, registrations.c.status == from_status)
+    try:
+        counts = dict(
+            ((status, activity_id), n) for status, n in db.session.execute(
+                select(registrations.c.status, func.count())
+                .where(and_(condition, registrations.c.status != new_status))
+                .group_by(registrations.c.status)
+            ).all()
+        )
+        for (old_status, _), expected in counts.items():
+            delta = _active_delta(old_status, new_status)
+            if delta:
+                users = User.__table__
+                db.session.execute(
+                    users.update()
+                    .where(users.c.id.in_(
+                        select(registrations.c.user_id)
+                        .where(and_(condition, registrations.c.status == old_status))
+                    ))
+                    .values(active_registration_count=users.c.active_registration_count + delta)
+                )
+            _update_where(condition, old_status, new_status, expected)
+        _apply_side_effects(counts, {}, new_status)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    by_status = {old_status: n for (old_status, _), n in counts.items()}
+    return sum(by_status.values()), by_status
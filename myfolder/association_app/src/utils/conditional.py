@@ -0,0 +1,48 @@
+"""条件请求（ETag / Last-Modified）
+
+视图先用一条轻量查询算出验证器，客户端缓存仍然有效时直接返回 304，
+不加载 ORM 对象也不序列化响应体。
+"""
+import hashlib
+from datetime import timezone
+
+from flask import Response, request
+
+
+def make_etag(*parts):
+    """由若干组成部分计算强 ETag 值（不含引号）"""
+    raw = '|'.join('' if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_not_modified(etag, last_modified=None):
+    """按 If-None-Match 优先、If-Modified-Since 其次判断客户端缓存是否有效"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = _naive_utc(request.if_modified_since)
+    last_modified = _naive_utc(last_modified)
+    if since is not None and last_modified is not None:
+        # HTTP 日期只精确到秒
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified_response(etag, last_modified=None):
+    """返回带验证器的 304 响应"""
+    response = Response(status=304)
+    return add_validators(response, etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """给响应加上 ETag / Last-Modified，并要求客户端每次重新验证"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
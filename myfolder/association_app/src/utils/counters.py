@@ -0,0 +1,108 @@
+"""报名计数冗余字段维护
+
+Activity 与 User 上的 registration_count / active_registration_count 在报名
+新增、状态变化、删除时于同一事务内增量更新，列表接口直接读行内计数。
+
+- 通过 ORM 写入的报名（session.add、修改 status、删除）由 after_flush 钩子自动记账；
+- 绕过 ORM 的 Core UPDATE 需自行调用 apply_change / apply_active_deltas；
+- 计数出现偏差时运行 `flask recount-registrations` 批量重算。
+"""
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from src.models import db
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.models.user import User
+
+# 计入“有效报名”的状态
+ACTIVE_STATUS = 'registered'
+
+activities = Activity.__table__
+users = User.__table__
+registrations = Registration.__table__
+
+
+def _deltas(old_status, new_status, created=False, deleted=False):
+    """返回 (总数增量, 有效数增量)"""
+    total = int(created) - int(deleted)
+    active = ((new_status == ACTIVE_STATUS and not deleted)
+              - (old_status == ACTIVE_STATUS and not created))
+    return total, active
+
+
+def _execute_deltas(conn, table, row_id, total, active):
+    if not total and not active:
+        return
+    values = {
+        'registration_count': table.c.registration_count + total,
+        'active_registration_count': table.c.active_registration_count + active,
+    }
+    if 'updated_at' in table.c:
+        # 计数变化不算活动内容修改，避免触发 onupdate
+        values['updated_at'] = table.c.updated_at
+    conn.execute(table.update().where(table.c.id == row_id).values(**values))
+
+
+def apply_change(user_id, activity_id, old_status, new_status, created=False, deleted=False, conn=None):
+    """记一条报名的状态变化"""
+    conn = conn if conn is not None else db.session
+    total, active = _deltas(old_status, new_status, created, deleted)
+    _execute_deltas(conn, activities, activity_id, total, active)
+    _execute_deltas(conn, users, user_id, total, active)
+
+
+def apply_active_deltas(table, deltas, conn=None):
+    """按 {行 id: 有效报名增量} 批量更新，增量相同的行合并为一条 UPDATE ... WHERE id IN"""
+    conn = conn if conn is not None else db.session
+    grouped = {}
+    for row_id, delta in deltas.items():
+        if delta:
+            grouped.setdefault(delta, []).append(row_id)
+    for delta, ids in grouped.items():
+        values = {'active_registration_count': table.c.active_registration_count + delta}
+        if 'updated_at' in table.c:
+            values['updated_at'] = table.c.updated_at
+        conn.execute(table.update().where(table.c.id.in_(ids)).values(**values))
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_registration_changes(session, flush_context):
+    """ORM 层的报名写入在 flush 后于同一连接上同步计数"""
+    pending = []
+    for obj in session.new:
+        if isinstance(obj, Registration):
+            pending.append((obj.user_id, obj.activity_id, None, obj.status, True, False))
+    for obj in session.dirty:
+        if isinstance(obj, Registration):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes() and history.deleted:
+                pending.append((obj.user_id, obj.activity_id, history.deleted[0], obj.status, False, False))
+    for obj in session.deleted:
+        if isinstance(obj, Registration):
+            pending.append((obj.user_id, obj.activity_id, obj.status, None, False, True))
+
+    if pending:
+        conn = session.connection()
+        for user_id, activity_id, old_status, new_status, created, deleted in pending:
+            apply_change(user_id, activity_id, old_status, new_status, created, deleted, conn=conn)
+
+
+def recount_all(conn=None):
+    """按报名表批量重算所有计数与剩余名额（调用方负责提交）"""
+    from src.utils.seats import SEAT_HOLDING_STATUSES
+
+    conn = conn if conn is not None else db.session
+    for table, fk in ((activities, registrations.c.activity_id), (users, registrations.c.user_id)):
+        total = select(func.count(registrations.c.id)).where(fk == table.c.id).scalar_subquery()
+        active = select(func.count(registrations.c.id)).where(
+            fk == table.c.id, registrations.c.status == ACTIVE_STATUS
+        ).scalar_subquery()
+        values = {'registration_count': total, 'active_registration_count': active}
+        if table is activities:
+            held = select(func.count(registrations.c.id)).where(
+                fk == table.c.id, registrations.c.status.in_(SEAT_HOLDING_STATUSES)
+            ).scalar_subquery()
+            values['seats_remaining'] = table.c.max_participants - held
+            values['updated_at'] = table.c.updated_at
+        conn.execute(table.update().values(**values))
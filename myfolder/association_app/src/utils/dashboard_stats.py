@@ -0,0 +1,70 @@
+"""仪表盘统计快照
+
+用户、活动、报名三类统计各用一条 GROUP BY 查询得出，结果作为快照存入
+共享状态，所有 worker 共用。快照记录计算时三张表的版本号，任一表有写
+事务提交或超过 TTL 即失效，下一个请求重新计算。
+"""
+import json
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func
+
+from src.models import db
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.models.user import User
+from src.utils.shared_state import get_shared_state
+
+SNAPSHOT_KEY = 'dashboard:stats'
+WATCHED_TABLES = ('users', 'activities', 'registrations')
+
+
+def _grouped_counts(column):
+    """SELECT column, COUNT(*) ... GROUP BY column，返回 {值: 数量}"""
+    return dict(db.session.query(column, func.count()).group_by(column).all())
+
+
+def compute_stats():
+    """从数据库计算统计数据"""
+    users = _grouped_counts(User.role)
+    acts = _grouped_counts(Activity.status)
+    regs = _grouped_counts(Registration.status)
+
+    recent_acts = Activity.query.order_by(Activity.created_at.desc()).limit(5).all()
+    upcoming_acts = Activity.query.filter(
+        Activity.start_time > datetime.utcnow(),
+        Activity.status == 'active'
+    ).order_by(Activity.start_time).limit(5).all()
+
+    return {
+        'stats': {
+            'users': {'total': sum(users.values()), 'students': users.get('student', 0),
+                      'admins': users.get('admin', 0)},
+            'activities': {'total': sum(acts.values()), 'active': acts.get('active', 0),
+                           'completed': acts.get('completed', 0), 'cancelled': acts.get('cancelled', 0)},
+            'registrations': {'total': sum(regs.values()), 'active': regs.get('registered', 0),
+                              'cancelled': regs.get('cancelled', 0)}
+        },
+        'recent_activities': [act.to_dict() for act in recent_acts],
+        'upcoming_activities': [act.to_dict() for act in upcoming_acts]
+    }
+
+
+def get_stats():
+    """优先返回仍然有效的共享快照，否则重新计算并写回"""
+    state = get_shared_state()
+    generations = state.generations(WATCHED_TABLES)
+    if generations is not None:
+        cached = state.get(SNAPSHOT_KEY)
+        if cached:
+            snapshot = json.loads(cached)
+            if tuple(snapshot['generations']) == generations:
+                return snapshot['data']
+
+    data = compute_stats()
+    if generations is not None:
+        # 记录的是计算前读到的版本号，计算期间若有写入，下次读取会发现不一致
+        state.set(SNAPSHOT_KEY, json.dumps({'generations': generations, 'data': data}),
+                  ttl=current_app.config['DASHBOARD_STATS_TTL'])
+    return data
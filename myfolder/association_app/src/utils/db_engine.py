@@ -0,0 +1,150 @@
+"""数据库引擎配置档
+
+DB_ENGINE_PROFILE 选择连接参数，默认 auto 按 DATABASE_URL 判断：
+- sqlite：每个连接建立时执行 PRAGMA journal_mode=WAL、synchronous、busy_timeout、
+  mmap_size；WAL 下读写互不阻塞，写锁冲突时等待 busy_timeout 而不是立即报
+  "database is locked"。连接放入 QueuePool 复用，不必每次请求重新打开文件。
+- postgres：连接池大小、溢出、超时与回收时间，取连接前 pre-ping，
+  并通过连接参数设置服务端 statement_timeout。
+- default：不做任何调整。
+
+两种配置档都在连接池上登记事件，统计取出/归还次数、当前与峰值占用、
+单次占用时长等，见 PoolMetrics。
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+PROFILES = ('sqlite', 'postgres', 'default')
+
+
+def resolve_profile(app):
+    """解析实际使用的配置档"""
+    profile = app.config['DB_ENGINE_PROFILE']
+    if profile != 'auto':
+        if profile not in PROFILES:
+            raise ValueError(f'unknown DB_ENGINE_PROFILE: {profile}')
+        return profile
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # 内存库依赖单连接，保留 SQLAlchemy 的默认连接池
+        return 'sqlite' if url.database not in (None, '', ':memory:') else 'default'
+    if url.get_backend_name() in ('postgresql', 'postgres'):
+        return 'postgres'
+    return 'default'
+
+
+def engine_options(app, profile):
+    """返回传给 create_engine 的参数"""
+    config = app.config
+    if profile == 'sqlite':
+        return {
+            'poolclass': QueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            # 连接由连接池在线程间轮流使用，同一时刻只属于一个线程
+            'connect_args': {'check_same_thread': False,
+                             'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000},
+        }
+    if profile == 'postgres':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+            'connect_args': {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"},
+        }
+    return {}
+
+
+def _sqlite_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+
+class PoolMetrics:
+    """连接池事件计数（当前 worker）"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.stats = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'invalidations': 0,
+                      'checked_out': 0, 'peak_checked_out': 0,
+                      'held_seconds_total': 0.0, 'held_seconds_max': 0.0}
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.stats['connects'] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['checked_out'] += 1
+            self.stats['peak_checked_out'] = max(self.stats['peak_checked_out'],
+                                                 self.stats['checked_out'])
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None)
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        with self._lock:
+            self.stats['checkins'] += 1
+            self.stats['checked_out'] -= 1
+            self.stats['held_seconds_total'] += held
+            self.stats['held_seconds_max'] = max(self.stats['held_seconds_max'], held)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.stats['invalidations'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['held_seconds_avg'] = (stats['held_seconds_total'] / stats['checkins']
+                                     if stats['checkins'] else 0.0)
+        pool = self.engine.pool
+        stats['pool'] = {'class': type(pool).__name__, 'status': pool.status()}
+        if isinstance(pool, QueuePool):
+            stats['pool'].update(size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+        return stats
+
+
+def init_app(app):
+    """按配置档设置引擎参数并创建引擎，由 init_db 在建表前调用"""
+    from src.models import db
+
+    profile = resolve_profile(app)
+    options = engine_options(app, profile)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    with app.app_context():
+        # Flask-SQLAlchemy 延迟创建引擎，这里提前创建以便在第一个连接建立前登记事件
+        engine = db.get_engine()
+    if profile == 'sqlite':
+        pragmas = _sqlite_pragmas(app.config)
+
+        @event.listens_for(engine, 'connect')
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    app.extensions['db_engine_profile'] = profile
+    app.extensions['db_pool_metrics'] = PoolMetrics(engine)
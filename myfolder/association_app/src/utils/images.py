@@ -0,0 +1,211 @@
+"""上传图片处理管道
+
+- 原图按内容 SHA-256 命名存放在 static/uploads/<前两位>/<哈希>.<扩展名>，
+  重复上传同一张图只保存一份，直接复用已有记录；
+- 缩略图（thumb）、卡片（card）、大图（full）三种宽度的变体在后台线程池中生成，
+  先按 EXIF 方向旋正并去掉元数据，不放大小图；
+- 变体就绪后写回 uploaded_images 的 variants/srcset，并回填到引用该图片的活动，
+  前端用 image_url + image_srcset 输出响应式 <img>。
+
+依赖 Pillow（可选）；未安装或 GIF 动图时只保存原图，不生成变体。
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from src.models import db
+from src.models.activity import Activity
+from src.models.image import UploadedImage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+# (变体名, 最大宽度)，按宽度递增
+VARIANTS = (('thumb', 320), ('card', 800), ('full', 1600))
+# Pillow 识别出的格式 -> 保存用的扩展名
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+ALLOWED_EXT = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+
+class InvalidImage(ValueError):
+    """上传内容不是可识别的图片"""
+
+
+def _upload_dir():
+    return os.path.join(current_app.static_folder, 'uploads')
+
+
+def _path_for(content_hash, suffix, ext):
+    return os.path.join(_upload_dir(), content_hash[:2], f'{content_hash}{suffix}.{ext}')
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _inspect(data, filename):
+    """返回 (扩展名, 宽, 高)；有 Pillow 时以实际内容为准"""
+    if Image is None:
+        ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if ext not in ALLOWED_EXT:
+            raise InvalidImage(filename)
+        return ('jpg' if ext == 'jpeg' else ext), None, None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+            fmt, (width, height) = img.format, img.size
+    except Exception as e:
+        raise InvalidImage(filename) from e
+    if fmt not in FORMATS:
+        raise InvalidImage(filename)
+    return FORMATS[fmt], width, height
+
+
+def _encode(img, ext, quality):
+    buf = io.BytesIO()
+    if ext == 'jpg':
+        img.convert('RGB').save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+    elif ext == 'webp':
+        img.save(buf, 'WEBP', quality=quality, method=4)
+    else:
+        img.save(buf, 'PNG', optimize=True)
+    return buf.getvalue()
+
+
+def render_variants(data, ext, quality):
+    """生成各尺寸变体，返回 [(变体名, 宽, 高, 字节)]；宽度相同的变体只保留较小的一个"""
+    with Image.open(io.BytesIO(data)) as original:
+        img = ImageOps.exif_transpose(original)
+        img.load()
+    results = []
+    produced_widths = set()
+    for name, max_width in VARIANTS:
+        width = min(max_width, img.width)
+        if width in produced_widths:
+            continue
+        produced_widths.add(width)
+        height = max(1, round(img.height * width / img.width))
+        resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+        results.append((name, width, height, _encode(resized, ext, quality)))
+    return results
+
+
+class ImagePipeline:
+    def __init__(self, app, workers=2, quality=82):
+        self.app = app
+        self.workers = workers
+        self.quality = quality
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # 线程池在各 gunicorn worker fork 之后按需创建
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='image-variants')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def submit(self, content_hash):
+        return self._executor().submit(self._process, content_hash)
+
+    def _process(self, content_hash):
+        with self.app.app_context():
+            try:
+                self._generate(content_hash)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f'image variants failed for {content_hash}: {e}', exc_info=True)
+                record = UploadedImage.query.filter_by(content_hash=content_hash).first()
+                if record:
+                    record.status = 'failed'
+                    db.session.commit()
+            finally:
+                db.session.remove()
+
+    def _generate(self, content_hash):
+        record = UploadedImage.query.filter_by(content_hash=content_hash).first()
+        if record is None or record.status == 'ready':
+            return
+        with open(_path_for(content_hash, '', record.ext), 'rb') as f:
+            data = f.read()
+
+        variants = {}
+        for name, width, height, encoded in render_variants(data, record.ext, self.quality):
+            _write_atomic(_path_for(content_hash, f'_{name}', record.ext), encoded)
+            variants[name] = {'url': f'/static/uploads/{content_hash[:2]}/{content_hash}_{name}.{record.ext}',
+                              'width': width, 'height': height, 'bytes': len(encoded)}
+
+        record.variants = json.dumps(variants)
+        record.srcset = ', '.join(f"{v['url']} {v['width']}w" for v in variants.values())
+        record.status = 'ready'
+        # 回填已引用该图片的活动（更新 updated_at，活动接口的缓存随之失效）
+        db.session.execute(
+            Activity.__table__.update()
+            .where(Activity.__table__.c.image_url == record.url)
+            .values(image_srcset=record.srcset)
+        )
+        db.session.commit()
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=True)
+        self._pool = None
+
+
+def store_upload(file_storage):
+    """保存上传的图片并安排生成变体，返回 (UploadedImage, future 或 None)
+
+    同一内容已上传过时直接返回已有记录，不重复写文件。
+    """
+    data = file_storage.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+    record = UploadedImage.query.filter_by(content_hash=content_hash).first()
+    if record is not None and record.status != 'failed':
+        return record, None
+
+    ext, width, height = _inspect(data, file_storage.filename or '')
+    path = _path_for(content_hash, '', ext)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+
+    can_resize = Image is not None and ext != 'gif'
+    if record is None:
+        record = UploadedImage(content_hash=content_hash, ext=ext, width=width, height=height,
+                               original_bytes=len(data),
+                               status='processing' if can_resize else 'ready')
+        db.session.add(record)
+    else:
+        record.status = 'processing'
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 另一个请求同时上传了同一张图
+        db.session.rollback()
+        return UploadedImage.query.filter_by(content_hash=content_hash).one(), None
+
+    if not can_resize:
+        return record, None
+    return record, current_app.extensions['image_pipeline'].submit(content_hash)
+
+
+def init_app(app):
+    app.extensions['image_pipeline'] = ImagePipeline(
+        app,
+        workers=app.config['IMAGE_VARIANT_WORKERS'],
+        quality=app.config['IMAGE_QUALITY'],
+    )
@@ -0,0 +1,295 @@
+"""请求级指标与 /metrics（Prometheus 文本格式）
+
+每个请求记录：
+- 耗时、响应体字节数：按 蓝图 × 端点 的直方图；
+- SQL 语句数与数据库耗时：挂在引擎的 before/after_cursor_execute 事件上，
+  按请求累计后同样计入直方图；
+- 请求数：按 蓝图 × 端点 × 方法 × 状态码 计数。
+
+单个请求的 SQL 语句数达到 METRICS_N_PLUS_ONE_THRESHOLD 时记一条警告日志，
+列出重复次数最多的语句，便于定位 N+1 查询。
+
+各 worker 在内存中累计，由后台线程每 METRICS_FLUSH_INTERVAL 秒（以及进程退出时）
+把自上次上报以来的增量合并进共享状态中的总计；worker 空闲、重启或退出都不会让
+已上报的计数消失或回退，/metrics 读取该总计。
+设置 METRICS_TOKEN 后抓取需带 Authorization: Bearer <token>；未设置时只允许本机访问。
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 名称 -> (类型, 说明, 直方图分桶)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', '请求处理耗时', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', '响应体字节数', SIZE_BUCKETS),
+    'db_queries_per_request': ('histogram', '单个请求执行的 SQL 语句数', QUERY_BUCKETS),
+    'db_time_per_request_seconds': ('histogram', '单个请求的数据库耗时', LATENCY_BUCKETS),
+    'http_requests_total': ('counter', '请求数', None),
+    'db_statements_total': ('counter', 'SQL 语句数', None),
+    'n_plus_one_requests_total': ('counter', 'SQL 语句数超过阈值的请求数', None),
+    'rate_limit_requests_total': ('counter', '登录/注册限流的放行与拒绝次数', None),
+}
+TOTAL_KEY = 'metrics:total'
+LOCAL_ADDRS = ('127.0.0.1', '::1')
+# N+1 日志中列出的语句数与每条语句的截断长度
+TOP_STATEMENTS = 3
+STATEMENT_PREVIEW = 200
+
+
+class Registry:
+    """当前 worker 的指标：{名称: {标签 JSON: 直方图分桶计数 + [sum, count] 或计数值}}"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {name: {} for name in METRICS}
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = json.dumps(labels, sort_keys=True, ensure_ascii=False)
+        with self._lock:
+            series = self.values[name].get(key)
+            if series is None:
+                series = self.values[name][key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def inc(self, name, labels, amount=1):
+        key = json.dumps(labels, sort_keys=True, ensure_ascii=False)
+        with self._lock:
+            self.values[name][key] = self.values[name].get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {key: list(v) if isinstance(v, list) else v for key, v in series.items()}
+                    for name, series in self.values.items()}
+
+
+def merge(snapshots):
+    """逐项相加多个 worker 的快照"""
+    total = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            if name not in total:
+                continue
+            for key, value in series.items():
+                current = total[name].get(key)
+                if current is None:
+                    total[name][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    total[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    total[name][key] = current + value
+    return total
+
+
+def diff(new, old):
+    """new 相对 old 的增量（计数只增不减）"""
+    delta = {}
+    for name, series in new.items():
+        previous = old.get(name, {})
+        changed = {}
+        for key, value in series.items():
+            before = previous.get(key)
+            if before is None:
+                changed[key] = value
+            elif isinstance(value, list):
+                if value != before:
+                    changed[key] = [a - b for a, b in zip(value, before)]
+            elif value != before:
+                changed[key] = value - before
+        if changed:
+            delta[name] = changed
+    return delta
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render(values):
+    """输出 Prometheus 文本格式"""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key, value in sorted(values.get(name, {}).items()):
+            labels = json.loads(key)
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            for bound, count in zip(buckets, value):
+                lines.append(f'{name}_bucket{_labels(labels, {"le": str(bound)})} {count}')
+            lines.append(f'{name}_bucket{_labels(labels, {"le": "+Inf"})} {value[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {value[-2]:.6g}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """挂接请求与引擎事件，维护本 worker 的 Registry 并定期上报"""
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.registry = Registry()
+        self.threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        # 已并入共享总计的快照
+        self._flushed = {}
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            context._metrics_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None or not has_request_context():
+            return
+        stats = g.get('_sql_stats')
+        if stats is None:
+            stats = g._sql_stats = {'count': 0, 'seconds': 0.0, 'statements': Counter()}
+        stats['count'] += 1
+        stats['seconds'] += time.perf_counter() - started
+        stats['statements'][statement] += 1
+
+    def _start(self):
+        g._request_started = time.perf_counter()
+        if self._thread_pid != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self):
+        # 上报线程在各 gunicorn worker fork 之后按需启动
+        with self._flush_lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.warning(f'metrics flush failed: {e}')
+
+    def _finish(self, response):
+        started = g.pop('_request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        labels = {'blueprint': request.blueprint or 'app', 'endpoint': endpoint}
+        stats = g.pop('_sql_stats', None) or {'count': 0, 'seconds': 0.0, 'statements': Counter()}
+
+        registry = self.registry
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        size = response.content_length if not response.is_streamed else None
+        if size is not None:
+            registry.observe('http_response_size_bytes', labels, size)
+        registry.observe('db_queries_per_request', labels, stats['count'])
+        registry.observe('db_time_per_request_seconds', labels, stats['seconds'])
+        registry.inc('http_requests_total',
+                     {**labels, 'method': request.method, 'status': str(response.status_code)})
+        if stats['count']:
+            registry.inc('db_statements_total', labels, stats['count'])
+        if self.threshold and stats['count'] >= self.threshold:
+            registry.inc('n_plus_one_requests_total', labels)
+            top = '; '.join(f'{n}x {sql[:STATEMENT_PREVIEW]}'
+                            for sql, n in stats['statements'].most_common(TOP_STATEMENTS))
+            self.app.logger.warning(
+                f'possible N+1: {request.method} {request.path} ({endpoint}) executed '
+                f'{stats["count"]} statements in {stats["seconds"] * 1000:.1f}ms; top: {top}')
+        return response
+
+    def _worker_snapshot(self):
+        snapshot = self.registry.snapshot()
+        limiter = self.app.extensions.get('rate_limiter')
+        if limiter is not None:
+            limits = limiter.snapshot()
+            series = snapshot['rate_limit_requests_total']
+            for result in ('allowed', 'blocked'):
+                for route_scope, count in limits[result].items():
+                    route, scope = route_scope.split(':', 1)
+                    key = json.dumps({'result': result, 'route': route, 'scope': scope},
+                                     sort_keys=True, ensure_ascii=False)
+                    series[key] = count
+        return snapshot
+
+    def flush(self):
+        """把本 worker 自上次上报以来的增量合并进共享总计，失败时留待下次"""
+        state = self.app.extensions.get('shared_state')
+        if state is None:
+            return
+        with self._flush_lock:
+            snapshot = self._worker_snapshot()
+            delta = diff(snapshot, self._flushed)
+            if not delta:
+                return
+            merged = state.update(
+                TOTAL_KEY, lambda raw: (json.dumps(merge([json.loads(raw) if raw else {}, delta])), True),
+                ttl=None)
+            if merged:
+                self._flushed = snapshot
+
+    def collect(self):
+        """读取共享总计；共享状态不可用时只返回本 worker"""
+        self.flush()
+        state = self.app.extensions.get('shared_state')
+        blob = state.get(TOTAL_KEY) if state is not None else None
+        if not blob:
+            return self._worker_snapshot()
+        return json.loads(blob)
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+    elif request.remote_addr not in LOCAL_ADDRS:
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    body = render(current_app.extensions['request_metrics'].collect())
+    response = Response(body, mimetype='text/plain; version=0.0.4')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def init_app(app):
+    """在 init_db 之后调用（需要已创建的引擎）"""
+    from src.models import db
+
+    if not app.config['METRICS_ENABLED']:
+        return
+    with app.app_context():
+        engine = db.get_engine()
+    app.extensions['request_metrics'] = RequestMetrics(app, engine)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,207 @@
+"""轻量级数据库结构迁移
+
+db.create_all() 只会创建缺失的表，不会给已有的表补列、补索引。这里按版本号登记
+一组幂等的迁移步骤，已执行的版本记录在 schema_migrations 表中：
+
+- 启动时 init_db 自动执行尚未记录的版本；也可手动运行 `flask db-upgrade`；
+- 每一步都先检查列/索引是否已存在，新库（create_all 已建好）上只会登记版本号；
+- 多个 gunicorn worker 同时启动时，重复的 DDL 失败后会重新检查并跳过。
+
+适用于 SQLite 与 PostgreSQL。
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from src.models import db
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.models.user import User
+
+_meta = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _meta,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """登记一个迁移步骤，函数接收数据库连接"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def _has_column(conn, table, column):
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table, column, ddl):
+    """列不存在时执行 ALTER TABLE ADD COLUMN，返回是否新增"""
+    if _has_column(conn, table, column):
+        return False
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+    except DBAPIError:
+        # 其他 worker 抢先加上了
+        if _has_column(conn, table, column):
+            return False
+        raise
+    return True
+
+
+def _has_index(conn, table, name=None, columns=None, unique=False):
+    insp = inspect(conn)
+    candidates = insp.get_indexes(table)
+    if unique:
+        candidates = [i for i in candidates if i.get('unique')] + insp.get_unique_constraints(table)
+    for index in candidates:
+        if name and index['name'] == name:
+            return True
+        if columns and list(index['column_names']) == list(columns):
+            return True
+    return False
+
+
+def _create_index(conn, index):
+    """按模型声明创建索引，已存在（同名或同列）则跳过"""
+    table = index.table.name
+    columns = [c.name for c in index.columns]
+    if _has_index(conn, table, index.name, columns, index.unique):
+        return False
+    try:
+        with conn.begin_nested():
+            index.create(bind=conn)
+    except DBAPIError:
+        if _has_index(conn, table, index.name, columns, index.unique):
+            return False
+        raise
+    return True
+
+
+@migration(1, '活动状态与剩余名额字段')
+def _activity_seats(conn):
+    from src.utils.seats import SEAT_HOLDING_STATUSES
+
+    _add_column(conn, 'activities', 'status', "VARCHAR(20) NOT NULL DEFAULT 'active'")
+    if _add_column(conn, 'activities', 'seats_remaining', 'INTEGER'):
+        activities, registrations = Activity.__table__, Registration.__table__
+        held = select(func.count(registrations.c.id)).where(
+            registrations.c.activity_id == activities.c.id,
+            registrations.c.status.in_(SEAT_HOLDING_STATUSES),
+        ).scalar_subquery()
+        conn.execute(activities.update().values(
+            seats_remaining=activities.c.max_participants - held,
+            updated_at=activities.c.updated_at,
+        ))
+
+
+@migration(2, '活动与用户的报名计数字段')
+def _registration_counters(conn):
+    added = False
+    for table in ('activities', 'users'):
+        added |= _add_column(conn, table, 'registration_count', 'INTEGER NOT NULL DEFAULT 0')
+        added |= _add_column(conn, table, 'active_registration_count', 'INTEGER NOT NULL DEFAULT 0')
+    if added:
+        from src.utils import counters
+        counters.recount_all(conn)
+
+
+@migration(3, '报名 (user_id, activity_id) 唯一约束')
+def _registration_unique(conn):
+    # SQLite 不支持给已有表加约束，用等价的唯一索引代替；存在重复数据时会失败，需先人工清理。
+    # 索引建在独立的表对象上：挂到模型的表上会让之后的 create_all 把约束与索引各建一次
+    table = Table('registrations', MetaData(), Column('user_id', Integer), Column('activity_id', Integer))
+    _create_index(conn, Index('uq_registrations_user_activity',
+                              table.c.user_id, table.c.activity_id, unique=True))
+
+
+def _create_model_indexes(conn, *models):
+    for model in models:
+        for index in model.__table__.indexes:
+            _create_index(conn, index)
+
+
+@migration(4, '热点查询索引')
+def _hot_path_indexes(conn):
+    _create_model_indexes(conn, User, Activity, Registration)
+
+
+@migration(5, '活动图片 srcset 字段')
+def _activity_image_srcset(conn):
+    _add_column(conn, 'activities', 'image_srcset', 'VARCHAR(1024)')
+
+
+@migration(6, '用户目录检索索引')
+def _user_directory_indexes(conn):
+    _create_model_indexes(conn, User)
+
+
+@migration(7, '活动全文检索索引')
+def _activity_search_index(conn):
+    from src.utils import activity_search
+
+    # SQLite 未编译 FTS5 时不建索引，检索接口退回 LIKE 匹配
+    if activity_search.create_index(conn):
+        activity_search.rebuild(conn, activity_search.detect_backend(conn))
+
+
+@migration(8, '用户目录前缀检索索引（PostgreSQL）')
+def _user_directory_pattern_indexes(conn):
+    # 非 C 排序规则下 LIKE 'q%' 只能用 text_pattern_ops 索引；SQLite 用范围条件，无需额外索引
+    if conn.dialect.name != 'postgresql':
+        return
+    from src.utils.user_directory import SEARCH_COLUMNS
+
+    for column in SEARCH_COLUMNS:
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS ix_users_{column.key}_pattern '
+                             f'ON users ({column.key} text_pattern_ops)')
+
+
+@migration(9, '活动全文检索索引收录单字')
+def _activity_search_unigrams(conn):
+    from src.utils import activity_search
+
+    # 索引内容变化，按新的切词规则重建
+    backend = activity_search.detect_backend(conn)
+    activity_search.rebuild(conn, backend)
+
+
+def upgrade(engine=None):
+    """执行所有尚未记录的迁移，返回本次执行的版本号列表"""
+    engine = engine if engine is not None else db.engine
+    schema_migrations.create(engine, checkfirst=True)
+    applied = []
+    with engine.connect() as conn:
+        done = {v for (v,) in conn.execute(schema_migrations.select().with_only_columns(
+            [schema_migrations.c.version]))}
+        for version, description, fn in MIGRATIONS:
+            if version in done:
+                continue
+            with conn.begin():
+                fn(conn)
+                try:
+                    with conn.begin_nested():
+                        conn.execute(schema_migrations.insert().values(
+                            version=version, description=description, applied_at=datetime.utcnow()))
+                except IntegrityError:
+                    pass  # 其他 worker 已登记
+            applied.append(version)
+    return applied
+
+
+def status(engine=None):
+    """返回 [(版本号, 说明, 执行时间或 None)]"""
+    engine = engine if engine is not None else db.engine
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = {row.version: row.applied_at for row in conn.execute(schema_migrations.select())}
+    return [(version, description, done.get(version)) for version, description, _ in MIGRATIONS]
@@ -0,0 +1,44 @@
+"""键集（游标）分页工具
+
+游标是排序键取值的 base64 编码，对客户端不透明。翻页条件写成
+(key < last_key) OR (key = last_key AND id < last_id)，
+配合对应索引，任意深度的页面代价都与第一页相同。
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(*values):
+    """把排序键编码成游标字符串，datetime 按 ISO 格式保存"""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    """解析游标，types 给出各排序键的类型（datetime 或 int）"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise InvalidCursor(token)
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(raw, types)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(token) from e
+
+
+def after_desc(key_column, id_column, key_value, id_value):
+    """按 (key, id) 降序排列时，位于游标之后的行的过滤条件"""
+    return or_(key_column < key_value, and_(key_column == key_value, id_column < id_value))
+
+
+def read_limit(args, default=20, maximum=100):
+    """读取 limit 参数并限制在 [1, maximum] 内"""
+    limit = args.get('limit', default, type=int)
+    return max(1, min(limit or default, maximum))
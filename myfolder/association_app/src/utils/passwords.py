@@ -0,0 +1,147 @@
+"""密码哈希
+
+算法与强度可配置：
+- PASSWORD_HASH_METHOD：pbkdf2:sha256（默认，兼容已有哈希）或 bcrypt
+- PASSWORD_HASH_COST：pbkdf2 的迭代次数 / bcrypt 的 rounds
+- PASSWORD_HASH_WORKERS：大于 0 时把哈希计算交给进程池，避免占满请求线程的 GIL
+- PASSWORD_HASH_MAX_PENDING / PASSWORD_HASH_TIMEOUT：进程池排队上限与等待秒数，
+  超出时抛出 HasherBusy，由接口返回 503；进程池崩溃（子进程被杀）同样抛出 HasherBusy，
+  下次调用重建进程池
+
+登录成功后若发现存储的哈希参数已过时，调用方可据 needs_rehash 透明地重新哈希。
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import bcrypt
+except ImportError:  # bcrypt 为可选依赖
+    bcrypt = None
+
+DEFAULT_METHOD = 'pbkdf2:sha256'
+DEFAULT_COSTS = {'pbkdf2:sha256': 260000, 'bcrypt': 12}
+
+
+class HasherBusy(Exception):
+    """进程池排队已满、等待超时或进程池已崩溃，暂时无法处理"""
+
+
+def _hash(method, cost, password):
+    if method == 'bcrypt':
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(cost)).decode('ascii')
+    return generate_password_hash(password, method=f'{method}:{cost}')
+
+
+def _verify(stored, password):
+    if stored.startswith('$2'):
+        if bcrypt is None:
+            return False
+        return bcrypt.checkpw(password.encode('utf-8'), stored.encode('ascii'))
+    return check_password_hash(stored, password)
+
+
+def parse_parameters(stored):
+    """从存储的哈希中解析 (算法, 强度)，无法识别时返回 (None, None)"""
+    if stored.startswith('$2'):
+        parts = stored.split('$')
+        return 'bcrypt', int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None
+    if stored.startswith('pbkdf2:'):
+        method = stored.split('$', 1)[0].split(':')
+        if len(method) == 3 and method[2].isdigit():
+            return f'pbkdf2:{method[1]}', int(method[2])
+        # werkzeug 省略迭代次数时使用其默认值
+        return f'pbkdf2:{method[1]}', DEFAULT_COSTS.get(f'pbkdf2:{method[1]}')
+    return None, None
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, cost=None, workers=0, max_pending=32, timeout=10):
+        if method not in DEFAULT_COSTS:
+            raise ValueError(f'unsupported password hash method: {method}')
+        if method == 'bcrypt' and bcrypt is None:
+            raise RuntimeError('PASSWORD_HASH_METHOD=bcrypt requires the bcrypt package')
+        self.method = method
+        self.cost = cost or DEFAULT_COSTS[method]
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        # 进程池在各 gunicorn worker fork 之后按需创建
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy()
+        try:
+            executor = self._executor()
+            future = executor.submit(fn, *args)
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise HasherBusy()
+        finally:
+            self._slots.release()
+
+    def _discard(self, executor):
+        """丢弃已崩溃的进程池，下次调用重新创建"""
+        with self._pool_lock:
+            if self._pool is executor:
+                self._pool = None
+        executor.shutdown(wait=False)
+
+    def hash(self, password):
+        return self._run(_hash, self.method, self.cost, password)
+
+    def verify(self, stored, password):
+        if not stored:
+            return False
+        return self._run(_verify, stored, password)
+
+    def needs_rehash(self, stored):
+        return parse_parameters(stored) != (self.method, self.cost)
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False)
+        self._pool = None
+
+
+_default_hasher = None
+
+
+def get_hasher():
+    """当前应用配置的哈希器；无应用上下文（脚本）时使用默认配置"""
+    global _default_hasher
+    if has_app_context() and 'password_hasher' in current_app.extensions:
+        return current_app.extensions['password_hasher']
+    if _default_hasher is None:
+        _default_hasher = PasswordHasher()
+    return _default_hasher
+
+
+def init_app(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        cost=app.config['PASSWORD_HASH_COST'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    )
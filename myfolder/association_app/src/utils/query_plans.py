@@ -0,0 +1,102 @@
+"""热点查询的执行计划
+
+按蓝图列出各接口的关键查询（与路由中的写法保持一致），`flask explain-queries`
+逐条输出执行计划，用于确认索引是否被用上。SQLite 使用 EXPLAIN QUERY PLAN，
+PostgreSQL 使用 EXPLAIN；示例参数取自库中已有数据，空库上也能运行。
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select
+
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.models.user import User
+from src.utils.seats import SEAT_HOLDING_STATUSES
+
+activities = Activity.__table__
+registrations = Registration.__table__
+users = User.__table__
+
+
+def _sample(conn):
+    """取一组存在的 id 作为示例参数"""
+    user_id = conn.execute(select(func.min(users.c.id))).scalar() or 1
+    activity_id = conn.execute(select(func.min(activities.c.id))).scalar() or 1
+    return user_id, activity_id, datetime.utcnow()
+
+
+def hot_queries(conn):
+    """返回 {蓝图: [(说明, 语句)]}"""
+    user_id, activity_id, now = _sample(conn)
+    return {
+        'activities': [
+            ('列表（按状态，offset 分页）',
+             select(activities).where(activities.c.status == 'active')
+             .order_by(activities.c.created_at.desc()).limit(10)),
+            ('列表（键集分页）',
+             select(activities).where(or_(
+                 activities.c.created_at < now,
+                 and_(activities.c.created_at == now, activities.c.id < activity_id)))
+             .order_by(activities.c.created_at.desc(), activities.c.id.desc()).limit(11)),
+            ('列表 ETag（max(updated_at) + count）',
+             select(func.max(activities.c.updated_at), func.count(activities.c.id))
+             .where(activities.c.status == 'active')),
+            ('详情 ETag', select(activities.c.updated_at).where(activities.c.id == activity_id)),
+        ],
+        'registration': [
+            ('抢占名额（条件 UPDATE）',
+             activities.update().where(and_(
+                 activities.c.id == activity_id, activities.c.status == 'active',
+                 activities.c.registration_deadline > now,
+                 or_(activities.c.seats_remaining.is_(None), activities.c.seats_remaining > 0)))
+             .values(seats_remaining=activities.c.seats_remaining - 1)),
+            ('我的报名（JOIN + 键集分页）',
+             select(registrations, activities)
+             .join(activities, activities.c.id == registrations.c.activity_id)
+             .where(registrations.c.user_id == user_id)
+             .order_by(registrations.c.registration_time.desc(), registrations.c.id.desc())
+             .limit(51)),
+            ('报名状态',
+             select(registrations).where(registrations.c.user_id == user_id,
+                                         registrations.c.activity_id == activity_id)),
+        ],
+        'dashboard': [
+            ('统计：用户按角色', select(users.c.role, func.count()).group_by(users.c.role)),
+            ('统计：活动按状态', select(activities.c.status, func.count()).group_by(activities.c.status)),
+            ('统计：报名按状态',
+             select(registrations.c.status, func.count()).group_by(registrations.c.status)),
+            ('统计：即将开始的活动',
+             select(activities).where(activities.c.start_time > now, activities.c.status == 'active')
+             .order_by(activities.c.start_time).limit(5)),
+            ('剩余名额重算（占名额的报名数）',
+             select(func.count(registrations.c.id)).where(
+                 registrations.c.activity_id == activity_id,
+                 registrations.c.status.in_(SEAT_HOLDING_STATUSES))),
+            ('导出参与者（JOIN）',
+             select(users.c.username, users.c.full_name, registrations.c.registration_time)
+             .join(users, users.c.id == registrations.c.user_id)
+             .where(registrations.c.activity_id == activity_id).order_by(registrations.c.id)),
+            ('按条件批量改状态',
+             select(registrations.c.id, registrations.c.user_id, registrations.c.activity_id)
+             .where(registrations.c.activity_id == activity_id,
+                    registrations.c.status == 'registered')),
+        ],
+        'auth': [
+            ('按用户名登录', select(users).where(users.c.username == 'admin').limit(1)),
+        ],
+    }
+
+
+def explain(conn, stmt):
+    """返回语句执行计划的文本行（不带 ANALYZE，UPDATE 不会真正执行）"""
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    sqlite = conn.dialect.name == 'sqlite'
+    # 位置参数（qmark/format）与命名参数两种风格
+    if compiled.positiontup:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    rows = conn.exec_driver_sql(('EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN ') + str(compiled),
+                                params).fetchall()
+    # SQLite 每行为 (id, parent, notused, detail)，PostgreSQL 每行一列文本
+    return [row[-1] if sqlite else row[0] for row in rows]
@@ -0,0 +1,196 @@
+"""登录、注册接口的限流
+
+登录要做密码哈希校验，注册要查重并计算哈希，都不便宜；撞库脚本或异常客户端
+可以轻易占满一个 worker。这里按 路由 × 维度（来源 IP、用户名 + 来源 IP）做滑动窗口计数：
+
+- 用户名维度按 (用户名, IP) 计数：他人从别的 IP 反复输错密码不会锁住该账号；
+- 各规则依次检查，某条规则拒绝即停止，后面的规则不计数（被 IP 规则拒绝的请求
+  不消耗该用户名的额度）；
+- 每个键只保存 (窗口序号, 上一窗口计数, 本窗口计数) 三个整数，估计值为
+  上一窗口计数 × 上一窗口仍在滑动范围内的比例 + 本窗口计数；
+- 默认 RATE_LIMIT_BACKEND=shared，计数存于共享状态，各 worker 合计；
+  两种存储都会定期清理过期键，轮换用户名的撞库脚本不会让计数无限增长；
+  memory 存于进程内（每个 worker 各自计数），只适合单 worker 部署，
+  多 worker 时实际上限约为配置值 × worker 数，且取决于请求落到哪个 worker；
+- 限流检查在视图函数之前执行，只读取 IP 与请求体中的用户名，被拒绝的请求
+  不查库、不计算哈希，直接返回 429 与 Retry-After；
+- 放行与拒绝次数按 路由:维度 统计，管理员可在 /api/dashboard/rate-limits 查看。
+
+来源 IP 取 request.remote_addr；部署在反向代理之后时需设置 TRUSTED_PROXIES。
+"""
+import functools
+import json
+import math
+import threading
+import time
+from collections import Counter, namedtuple
+
+from flask import current_app, jsonify, request
+
+Rule = namedtuple('Rule', 'scope limit window')
+
+# 路由 -> [(维度, 配置项)]，配置值形如 "次数/秒数"
+RULES = {
+    'login': [('ip', 'RATE_LIMIT_LOGIN_IP'), ('username', 'RATE_LIMIT_LOGIN_USER')],
+    'register': [('ip', 'RATE_LIMIT_REGISTER_IP')],
+}
+# 用户名截断长度，避免超长输入撑大键
+MAX_IDENTITY_LENGTH = 64
+
+
+def parse_rule(spec):
+    """解析 "次数/秒数"，返回 (次数, 秒数)"""
+    limit, window = spec.split('/')
+    return int(limit), float(window)
+
+
+def _slide(state, limit, window, now):
+    """滑动窗口计数：state 为 (窗口序号, 上一窗口计数, 本窗口计数) 或 None
+
+    返回 (新 state, 需等待的秒数)，未超限时计入本次请求并返回 0。
+    """
+    index = int(now // window)
+    if state is None or state[0] < index - 1:
+        prev, curr = 0, 0
+    elif state[0] == index - 1:
+        prev, curr = state[2], 0
+    else:
+        prev, curr = state[1], state[2]
+    elapsed = now / window - index
+    if prev * (1 - elapsed) + curr + 1 <= limit:
+        return (index, prev, curr + 1), 0
+    # 超限：本窗口已满则等到下一窗口，否则等上一窗口的权重衰减到可放行
+    if curr + 1 > limit:
+        wait = (1 - elapsed + max(0.0, 1 - (limit - 1) / curr)) * window
+    else:
+        wait = (1 - (limit - curr - 1) / prev - elapsed) * window
+    return (index, prev, curr), max(wait, 0.001)
+
+
+class MemoryStore:
+    """进程内存储：{键: (state, 过期时间)}，每 sweep_every 次写入清理一次过期键"""
+
+    def __init__(self, sweep_every=1024):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.sweep_every = sweep_every
+
+    def update(self, key, fn, ttl):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            state = entry[0] if entry and entry[1] >= now else None
+            state, result = fn(state)
+            self._data[key] = (state, now + ttl)
+            self._writes += 1
+            if self._writes % self.sweep_every == 0:
+                self._data = {k: v for k, v in self._data.items() if v[1] >= now}
+        return result
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedStore:
+    """共享状态存储，state 以 JSON 保存；共享状态出错时放行
+
+    每个 worker 至多每 purge_interval 秒清理一次已过期的键。
+    """
+
+    def __init__(self, state, purge_interval=60):
+        self.state = state
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+
+    def update(self, key, fn, ttl):
+        if time.monotonic() - self._last_purge > self.purge_interval:
+            self._last_purge = time.monotonic()
+            self.state.purge_expired()
+
+        def apply(raw):
+            value, result = fn(tuple(json.loads(raw)) if raw else None)
+            return json.dumps(value), result
+        result = self.state.update(f'ratelimit:{key}', apply, ttl)
+        return 0 if result is None else result
+
+
+class RateLimiter:
+    def __init__(self, store, rules, backend='memory'):
+        self.store = store
+        self.rules = rules
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.allowed = Counter()
+        self.blocked = Counter()
+
+    def check(self, route, identities):
+        """按路由的各条规则依次计数，返回需等待的秒数，0 表示放行
+
+        某条规则拒绝即返回，后面的规则不计数。
+        """
+        now = time.time()
+        for rule in self.rules.get(route, ()):
+            identity = identities.get(rule.scope)
+            if not identity:
+                continue
+            key = f'{route}:{rule.scope}:{identity}'
+            wait = self.store.update(
+                key, lambda state: _slide(state, rule.limit, rule.window, now), ttl=2 * rule.window)
+            with self._lock:
+                (self.blocked if wait else self.allowed)[f'{route}:{rule.scope}'] += 1
+            if wait:
+                return wait
+        return 0
+
+    def snapshot(self):
+        with self._lock:
+            allowed, blocked = dict(self.allowed), dict(self.blocked)
+        return {
+            'backend': self.backend,
+            'rules': {route: [f'{r.scope} {r.limit}/{r.window:g}s' for r in rules]
+                      for route, rules in self.rules.items()},
+            'allowed': allowed,
+            'blocked': blocked,
+            'tracked_keys': len(self.store) if isinstance(self.store, MemoryStore) else None,
+        }
+
+
+def _identities():
+    data = request.get_json(silent=True)
+    username = data.get('username') if isinstance(data, dict) else None
+    ip = request.remote_addr
+    return {
+        'ip': ip,
+        # 用户名维度绑定来源 IP，避免任何人都能把指定账号锁在登录之外
+        'username': f'{str(username).strip().lower()[:MAX_IDENTITY_LENGTH]}@{ip}' if username else None,
+    }
+
+
+def rate_limited(route):
+    """按 RULES[route] 限流的视图装饰器"""
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is not None:
+                wait = limiter.check(route, _identities())
+                if wait:
+                    response = jsonify({'success': False, 'message': '请求过于频繁，请稍后再试',
+                                        'retry_after': math.ceil(wait)})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+    rules = {route: [Rule(scope, *parse_rule(app.config[name])) for scope, name in specs]
+             for route, specs in RULES.items()}
+    backend = app.config['RATE_LIMIT_BACKEND']
+    store = SharedStore(app.extensions['shared_state']) if backend == 'shared' else MemoryStore()
+    app.extensions['rate_limiter'] = RateLimiter(store, rules, backend)
@@ -0,0 +1,115 @@
+"""公共只读接口的响应缓存
+
+每个 worker 进程内一份 LRU，按条目数和总字节数限制容量，并带 TTL。
+缓存条目记录写入时相关表的版本号（见 shared_state）；任一 worker 提交
+对这些表的写事务都会使版本号变化，其他 worker 下次命中时发现不一致即丢弃，
+从而实现跨 worker 失效。
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, make_response, request
+from werkzeug.http import parse_date, unquote_etag
+
+from src.utils.conditional import is_not_modified
+from src.utils.shared_state import get_shared_state
+
+# 缓存响应时保留的响应头
+_KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+
+class ResponseCache:
+    """线程安全的 LRU + TTL 缓存，条目为 (版本号, 过期时间, 状态码, 响应头, 响应体)"""
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024, ttl=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+
+    def get(self, key, generations):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[0] != generations or entry[1] < time.monotonic():
+                self._remove(key)
+                self.stats['stale'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def put(self, key, generations, status, headers, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (generations, time.monotonic() + self.ttl, status, headers, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry[4])
+
+    def snapshot(self):
+        """当前 worker 的命中统计"""
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries), 'bytes': self._bytes}
+
+
+def init_app(app):
+    app.extensions['response_cache'] = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+        ttl=app.config['RESPONSE_CACHE_TTL'],
+    )
+
+
+def cached_response(tables):
+    """缓存视图的 200 响应，tables 为响应所依赖的表；带 no-store 的响应不缓存"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions['response_cache']
+            generations = get_shared_state().generations(tables)
+            if generations is None:
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            entry = cache.get(key, generations)
+            if entry is not None:
+                _, _, status, headers, body = entry
+                etag = headers.get('ETag')
+                last_modified = parse_date(headers.get('Last-Modified'))
+                # 与未命中时视图的判断一致：If-None-Match 优先，其次 If-Modified-Since
+                if etag and is_not_modified(unquote_etag(etag)[0], last_modified):
+                    response = make_response('', 304)
+                    response.headers.update({k: v for k, v in headers.items() if k != 'Content-Type'})
+                else:
+                    response = make_response(body, status)
+                    response.headers.update(headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            cacheable = response.status_code == 200 and not response.is_streamed \
+                and 'no-store' not in response.headers.get('Cache-Control', '')
+            if cacheable:
+                headers = {k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers}
+                cache.put(key, generations, 200, headers, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
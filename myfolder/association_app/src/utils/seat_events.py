@@ -0,0 +1,217 @@
+"""活动名额与状态的实时推送（Server-Sent Events）
+
+学生在活动页等待名额时不必反复刷新：前端打开 /api/activities/seats/stream
+这一条长连接，服务端只在某个活动的剩余名额或状态变化时推送该活动的新值。
+
+- 记账：seats 中抢占/退还名额的 UPDATE 以及 ORM 对活动状态、名额的修改都会把
+  活动 id 记在会话上，事务提交后写入共享状态的 changes 日志（频道 seats），
+  回滚则丢弃；
+- 跨 worker 分发：每个 worker 有一个后台线程，在有订阅者时每 SSE_COALESCE_INTERVAL
+  秒读取一次新的变更，批量查询这些活动的当前值，与上次推送的值比较后只分发有变化的；
+- 合并：订阅者按活动 id 保存待发送的最新值，同一活动在一个周期内的多次变化只推送
+  一次，慢连接也不会堆积消息。
+
+每条推送连接都会长期占住处理它的线程，因此推送只在独立的 gevent 进程中提供
+（SSE_ENABLED=auto 时按 gevent 是否已 monkey patch 判断），普通请求的线程/进程不承载
+长连接。每个 worker 的连接总数与单个 IP 的连接数分别受 SSE_MAX_STREAMS、
+SSE_MAX_STREAMS_PER_IP 限制；未开启或超出上限时接口返回 503，前端改为轮询。
+"""
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from src.models import db
+from src.models.activity import Activity
+
+CHANNEL = 'seats'
+# 推送的字段，任一变化即推送
+FIELDS = ('seats_remaining', 'max_participants', 'status')
+# 变更日志保留时长（秒）
+CHANGE_RETENTION = 300
+
+activities = Activity.__table__
+
+
+def mark(activity_ids, session=None):
+    """记录本事务改动了名额或状态的活动，提交后推送"""
+    session = session if session is not None else db.session
+    session.info.setdefault('seat_activities', set()).update(activity_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_activity_changes(session, flush_context):
+    ids = []
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Activity) and obj.id is not None:
+            state = inspect(obj)
+            if obj in session.dirty and not any(state.attrs[name].history.has_changes()
+                                                for name in FIELDS):
+                continue
+            ids.append(obj.id)
+    if ids:
+        mark(ids, session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed(session):
+    ids = session.info.pop('seat_activities', None)
+    if ids and has_app_context() and 'shared_state' in current_app.extensions:
+        current_app.extensions['shared_state'].append_changes(CHANNEL, sorted(ids))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('seat_activities', None)
+
+
+def fetch(activity_ids):
+    """查询活动的当前名额与状态，返回 {id: 推送内容}"""
+    rows = db.session.execute(
+        select(activities.c.id, *(activities.c[name] for name in FIELDS))
+        .where(activities.c.id.in_(list(activity_ids)))
+    ).all()
+    return {row.id: dict(row._mapping) for row in rows}
+
+
+class Subscriber:
+    """一个 SSE 连接：activity_ids 为关注的活动（None 表示全部），pending 为待发送的最新值"""
+
+    def __init__(self, activity_ids=None, client=None):
+        self.activity_ids = activity_ids
+        self.client = client
+        self.pending = {}
+        self.cond = threading.Condition()
+
+    def offer(self, events):
+        with self.cond:
+            for activity_id, payload in events.items():
+                if self.activity_ids is None or activity_id in self.activity_ids:
+                    self.pending[activity_id] = payload
+            if self.pending:
+                self.cond.notify()
+
+    def wait(self, timeout):
+        """等待并取出待发送的事件，超时返回空列表"""
+        with self.cond:
+            if not self.pending:
+                self.cond.wait(timeout)
+            events, self.pending = list(self.pending.values()), {}
+        return events
+
+
+class SeatBroadcaster:
+    """每个 worker 一个：维护订阅者，后台线程读取变更日志并分发"""
+
+    def __init__(self, app, interval=1.0, enabled='auto', max_streams=0, max_streams_per_ip=0):
+        self.app = app
+        self.interval = interval
+        self.mode = enabled
+        self.max_streams = max_streams
+        self.max_streams_per_ip = max_streams_per_ip
+        self._subscribers = set()
+        self._per_client = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        # 上次推送给订阅者的值，用于只推送真正变化的活动
+        self._sent = {}
+
+    @property
+    def enabled(self):
+        """auto：仅在 gevent worker（已 monkey patch）中提供推送"""
+        if self.mode != 'auto':
+            return self.mode == 'true'
+        try:
+            from gevent import monkey
+        except ImportError:
+            return False
+        return monkey.is_module_patched('socket')
+
+    def subscribe(self, activity_ids=None, client=None):
+        """登记一条连接，超出总数或单个客户端的上限时返回 None"""
+        with self._lock:
+            if self.max_streams and len(self._subscribers) >= self.max_streams:
+                return None
+            if client and self.max_streams_per_ip and self._per_client[client] >= self.max_streams_per_ip:
+                return None
+            subscriber = Subscriber(activity_ids, client)
+            self._subscribers.add(subscriber)
+            if client:
+                self._per_client[client] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='seat-events', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            if subscriber.client:
+                self._per_client[subscriber.client] -= 1
+                if self._per_client[subscriber.client] <= 0:
+                    del self._per_client[subscriber.client]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _run(self):
+        state = self.app.extensions['shared_state']
+        seq = state.last_change() or 0
+        last_purge = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._subscribers:
+                    # 没有订阅者时退出，下次订阅重新启动并从最新位置读取
+                    self._thread = None
+                    self._sent.clear()
+                    return
+            result = state.changes_since(CHANNEL, seq)
+            if result is None:
+                continue
+            seq, keys = result
+            if keys:
+                try:
+                    self._dispatch({int(key) for key in keys})
+                except Exception as e:
+                    self.app.logger.warning(f'seat events dispatch failed: {e}')
+            if time.monotonic() - last_purge > CHANGE_RETENTION:
+                state.purge_changes(CHANGE_RETENTION)
+                last_purge = time.monotonic()
+
+    def _dispatch(self, activity_ids):
+        with self.app.app_context():
+            current = fetch(activity_ids)
+            db.session.remove()
+        events = {}
+        for activity_id in activity_ids:
+            payload = current.get(activity_id, {'id': activity_id, 'status': 'deleted'})
+            if self._sent.get(activity_id) != payload:
+                self._sent[activity_id] = payload
+                events[activity_id] = payload
+        if not events:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(events)
+
+
+def get_broadcaster():
+    return current_app.extensions['seat_events']
+
+
+def init_app(app):
+    app.extensions['seat_events'] = SeatBroadcaster(
+        app,
+        interval=app.config['SSE_COALESCE_INTERVAL'],
+        enabled=app.config['SSE_ENABLED'],
+        max_streams=app.config['SSE_MAX_STREAMS'],
+        max_streams_per_ip=app.config['SSE_MAX_STREAMS_PER_IP'],
+    )
@@ -0,0 +1,165 @@
+"""活动名额预留
+
+报名高峰时，每个请求只需对 activities 行执行一次条件 UPDATE 抢占名额，
+抢占成功后在同一事务内写入报名记录；(user_id, activity_id) 唯一约束保证
+一人一报。任一步失败都整体回滚，名额不会被超卖也不会泄漏。
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from src.models import db
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.utils import counters, seat_events
+
+# 占用名额的报名状态，已取消的报名不占名额
+SEAT_HOLDING_STATUSES = ('registered', 'attended')
+
+activities = Activity.__table__
+registrations = Registration.__table__
+
+
+class SeatReservationError(Exception):
+    """报名失败，message 直接返回给前端"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _claim_seat(activity_id, now):
+    """条件 UPDATE 抢占一个名额，成功返回 True"""
+    result = db.session.execute(
+        activities.update()
+        .where(and_(
+            activities.c.id == activity_id,
+            activities.c.status == 'active',
+            activities.c.registration_deadline > now,
+            or_(activities.c.seats_remaining.is_(None), activities.c.seats_remaining > 0)
+        ))
+        .values(seats_remaining=activities.c.seats_remaining - 1)
+    )
+    if result.rowcount != 1:
+        return False
+    seat_events.mark([activity_id])
+    return True
+
+
+def check_open(activity_id, now=None):
+    """按主键读一行判断活动能否报名，不能时返回 SeatReservationError，否则返回 None
+
+    只是预检（不加锁），真正的名额仍以 _claim_seat 的条件 UPDATE 为准。
+    """
+    now = now or datetime.utcnow()
+    row = db.session.execute(
+        select(activities.c.status, activities.c.registration_deadline, activities.c.seats_remaining)
+        .where(activities.c.id == activity_id)
+    ).first()
+    if row is None:
+        return SeatReservationError('活动不存在', 404)
+    if row.registration_deadline < now or row.status != 'active':
+        return SeatReservationError('活动报名已截止或已取消')
+    if row.seats_remaining is not None and row.seats_remaining <= 0:
+        return SeatReservationError('活动名额已满')
+    return None
+
+
+def _claim_failure(activity_id, now):
+    """抢占失败时才查询一次活动，给出具体原因"""
+    return check_open(activity_id, now) or SeatReservationError('活动名额已满')
+
+
+def adjust_seats(activity_id, delta):
+    """无条件调整剩余名额（取消报名或管理员改状态时使用）"""
+    if delta:
+        db.session.execute(
+            activities.update()
+            .where(and_(activities.c.id == activity_id,
+                        activities.c.seats_remaining.isnot(None)))
+            .values(seats_remaining=activities.c.seats_remaining + delta)
+        )
+        seat_events.mark([activity_id])
+
+
+def adjust_seats_bulk(deltas):
+    """按 {活动 id: 名额增量} 批量调整，增量相同的活动合并为一条 UPDATE"""
+    grouped = {}
+    for activity_id, delta in deltas.items():
+        if delta:
+            grouped.setdefault(delta, []).append(activity_id)
+    for delta, ids in grouped.items():
+        db.session.execute(
+            activities.update()
+            .where(and_(activities.c.id.in_(ids), activities.c.seats_remaining.isnot(None)))
+            .values(seats_remaining=activities.c.seats_remaining + delta)
+        )
+        seat_events.mark(ids)
+
+
+def seat_delta(old_status, new_status):
+    """状态变化对剩余名额的影响：占位 -> 不占位返还 1，反之扣减 1"""
+    return (old_status in SEAT_HOLDING_STATUSES) - (new_status in SEAT_HOLDING_STATUSES)
+
+
+def reserve(user_id, activity_id, notes=None):
+    """为用户报名活动并提交事务，返回报名记录；失败抛出 SeatReservationError"""
+    now = datetime.utcnow()
+    if not _claim_seat(activity_id, now):
+        error = _claim_failure(activity_id, now)
+        db.session.rollback()
+        raise error
+
+    reg = Registration(user_id=user_id, activity_id=activity_id, notes=notes)
+    reg.registration_time = now
+    try:
+        db.session.add(reg)
+        db.session.commit()
+        return reg
+    except IntegrityError:
+        # 唯一约束冲突：回滚会一并退还刚抢占的名额
+        db.session.rollback()
+
+    # 已有记录但已取消的，允许重新报名
+    if not _claim_seat(activity_id, now):
+        error = _claim_failure(activity_id, now)
+        db.session.rollback()
+        raise error
+    result = db.session.execute(
+        registrations.update()
+        .where(and_(registrations.c.user_id == user_id,
+                    registrations.c.activity_id == activity_id,
+                    registrations.c.status == 'cancelled'))
+        .values(status='registered', registration_time=now, notes=notes)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        raise SeatReservationError('您已报名此活动')
+    counters.apply_change(user_id, activity_id, 'cancelled', 'registered')
+    db.session.commit()
+    return Registration.query.filter_by(user_id=user_id, activity_id=activity_id).first()
+
+
+def release(user_id, activity_id):
+    """取消报名并退还名额，返回是否确有报名被取消（调用方负责提交）"""
+    row = db.session.execute(
+        registrations.select()
+        .with_only_columns([registrations.c.id, registrations.c.status])
+        .where(and_(registrations.c.user_id == user_id,
+                    registrations.c.activity_id == activity_id))
+    ).first()
+    if not row or row.status not in SEAT_HOLDING_STATUSES:
+        return False
+    # 以旧状态为条件更新，并发取消时只有一个请求生效
+    result = db.session.execute(
+        registrations.update()
+        .where(and_(registrations.c.id == row.id, registrations.c.status == row.status))
+        .values(status='cancelled')
+    )
+    if result.rowcount != 1:
+        return False
+    adjust_seats(activity_id, 1)
+    counters.apply_change(user_id, activity_id, row.status, 'cancelled')
+    return True
@@ -0,0 +1,88 @@
+"""列表接口的投影序列化
+
+列表接口不加载 ORM 对象：只 SELECT 需要的列得到元组，再按列整体格式化
+（先转置成列，对日期列一次性 map 格式化，最后 zip 回字典），输出与各模型
+to_dict() 完全一致。
+
+JSON 编码优先使用 orjson（可选依赖），未安装时退回 Flask 的 jsonify。
+"""
+from flask import current_app, jsonify
+
+from src.models.activity import Activity
+from src.models.registration import Registration
+from src.models.user import User
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _seconds(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value is not None else None
+
+
+class Projection:
+    """模型的一组输出字段：fields 为 (键, 列) 列表，formatters 为 {键: 格式化函数}"""
+
+    def __init__(self, fields, formatters=None):
+        self.keys = [key for key, _ in fields]
+        self._columns = dict(fields)
+        self.formatters = formatters or {}
+
+    def columns(self, keys=None, prefix=''):
+        """SELECT 用的列；prefix 用于联表时给列加标签，避免同名列冲突"""
+        keys = self.keys if keys is None else keys
+        if prefix:
+            return [self._columns[key].label(f'{prefix}{key}') for key in keys]
+        return [self._columns[key] for key in keys]
+
+    def serialize(self, rows, keys=None, start=0):
+        """把结果行转成字典列表；start 为本投影在行中的起始位置"""
+        keys = self.keys if keys is None else keys
+        if not rows:
+            return []
+        columns = list(zip(*rows))[start:start + len(keys)]
+        columns = [list(map(self.formatters[key], values)) if key in self.formatters else values
+                   for key, values in zip(keys, columns)]
+        return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+ACTIVITY = Projection([
+    ('id', Activity.id), ('title', Activity.title), ('description', Activity.description),
+    ('location', Activity.location), ('start_time', Activity.start_time),
+    ('end_time', Activity.end_time), ('registration_deadline', Activity.registration_deadline),
+    ('max_participants', Activity.max_participants), ('seats_remaining', Activity.seats_remaining),
+    ('status', Activity.status), ('image_url', Activity.image_url),
+    ('image_srcset', Activity.image_srcset), ('created_at', Activity.created_at),
+    ('updated_at', Activity.updated_at),
+], {key: _iso for key in ('start_time', 'end_time', 'registration_deadline',
+                          'created_at', 'updated_at')})
+
+USER = Projection([
+    ('id', User.id), ('username', User.username), ('email', User.email),
+    ('full_name', User.full_name), ('student_id', User.student_id), ('phone', User.phone),
+    ('department', User.department), ('major', User.major), ('role', User.role),
+    ('created_at', User.created_at), ('last_login', User.last_login),
+], {'created_at': _seconds, 'last_login': _seconds})
+
+REGISTRATION = Projection([
+    ('id', Registration.id), ('user_id', Registration.user_id),
+    ('activity_id', Registration.activity_id), ('registration_time', Registration.registration_time),
+    ('status', Registration.status), ('notes', Registration.notes),
+], {'registration_time': _seconds})
+
+
+def json_response(payload):
+    """序列化 JSON 响应；有 orjson 时直接编码为字节"""
+    if orjson is None:
+        return jsonify(payload)
+    option = orjson.OPT_NON_STR_KEYS
+    if current_app.config.get('JSON_SORT_KEYS', True):
+        option |= orjson.OPT_SORT_KEYS
+    return current_app.response_class(orjson.dumps(payload, option=option),
+                                      mimetype='application/json')
@@ -0,0 +1,276 @@
+"""跨 gunicorn worker 共享的小型状态存储
+
+用一个本地 SQLite 文件保存四类数据：
+- generations：按表名递增的版本号，任何 worker 提交写事务后自增，
+  各 worker 据此判断缓存是否失效；
+- blobs：带过期时间的键值（快照、计数等），所有 worker 共享一份；
+- changes：按频道追加的变更日志（只记键，不记内容），各 worker 按序号增量读取，
+  用于跨 worker 推送（见 seat_events）；
+- queues：排队取号的计数器（已发号、已放行），用于报名候场（见 admission）。
+
+共享存储出错时只记录日志，调用方按缓存未命中处理，不影响正常请求。
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)',
+    'CREATE INDEX IF NOT EXISTS ix_blobs_expires_at ON blobs (expires_at)',
+    'CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'channel TEXT NOT NULL, key TEXT NOT NULL, created_at REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS queues (name TEXT PRIMARY KEY, issued INTEGER NOT NULL, '
+    'admitted REAL NOT NULL, updated_at REAL NOT NULL)',
+)
+
+
+class SharedState:
+    """SQLite 文件支撑的共享状态，连接按进程、线程各自维护"""
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connect()
+        try:
+            for ddl in _SCHEMA:
+                conn.execute(ddl)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @property
+    def conn(self):
+        # fork 之后不能复用父进程的连接
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+        return local.conn
+
+    def _log_error(self, action, error):
+        if self.logger:
+            self.logger.warning(f'shared state {action} failed: {error}')
+
+    @contextmanager
+    def _immediate(self):
+        """读-改-写事务：BEGIN IMMEDIATE 先取得写锁，其他 worker 排队等待"""
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def generations(self, names):
+        """返回各表当前版本号元组，出错时返回 None"""
+        try:
+            rows = dict(self.conn.execute(
+                f"SELECT name, value FROM generations WHERE name IN ({','.join('?' * len(names))})",
+                tuple(names)
+            ).fetchall())
+        except sqlite3.Error as e:
+            self._log_error('read generations', e)
+            return None
+        return tuple(rows.get(name, 0) for name in names)
+
+    def bump(self, names):
+        """将给定表的版本号各加一"""
+        try:
+            self.conn.executemany(
+                'INSERT INTO generations (name, value) VALUES (?, 1) '
+                'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+                [(name,) for name in names]
+            )
+        except sqlite3.Error as e:
+            self._log_error('bump generations', e)
+
+    def get(self, key):
+        """读取未过期的值，不存在或已过期返回 None"""
+        try:
+            row = self.conn.execute(
+                'SELECT value, expires_at FROM blobs WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._log_error('get', e)
+            return None
+        if not row or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        """写入值，ttl 为秒数，None 表示不过期"""
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO blobs (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at)
+            )
+        except sqlite3.Error as e:
+            self._log_error('set', e)
+
+    def update(self, key, fn, ttl):
+        """原子地读-改-写一个键：fn(旧值或 None) 返回 (新值, 结果)，本方法返回结果，出错时返回 None
+
+        ttl 为秒数，None 表示不过期
+        """
+        now = time.time()
+        try:
+            with self._immediate() as conn:
+                row = conn.execute('SELECT value, expires_at FROM blobs WHERE key = ?', (key,)).fetchone()
+                current = row[0] if row and (row[1] is None or row[1] >= now) else None
+                value, result = fn(current)
+                conn.execute('INSERT OR REPLACE INTO blobs (key, value, expires_at) VALUES (?, ?, ?)',
+                             (key, value, now + ttl if ttl else None))
+        except sqlite3.Error as e:
+            self._log_error('update', e)
+            return None
+        return result
+
+    def scan(self, prefix):
+        """返回键以 prefix 开头且未过期的 {键: 值}，出错时返回 None"""
+        try:
+            rows = self.conn.execute(
+                'SELECT key, value FROM blobs WHERE key >= ? AND key < ? '
+                'AND (expires_at IS NULL OR expires_at >= ?)',
+                (prefix, prefix + '\uffff', time.time())
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._log_error('scan', e)
+            return None
+        return dict(rows)
+
+    def append_changes(self, channel, keys):
+        """向频道追加一批变更键"""
+        now = time.time()
+        try:
+            self.conn.executemany(
+                'INSERT INTO changes (channel, key, created_at) VALUES (?, ?, ?)',
+                [(channel, str(key), now) for key in keys]
+            )
+        except sqlite3.Error as e:
+            self._log_error('append changes', e)
+
+    def last_change(self):
+        """当前最大的变更序号，出错时返回 None"""
+        try:
+            return self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+        except sqlite3.Error as e:
+            self._log_error('read changes', e)
+            return None
+
+    def changes_since(self, channel, seq, limit=1000):
+        """返回 (最新序号, [键])：序号大于 seq 的频道变更，出错时返回 None"""
+        try:
+            rows = self.conn.execute(
+                'SELECT seq, key FROM changes WHERE seq > ? AND channel = ? ORDER BY seq LIMIT ?',
+                (seq, channel, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._log_error('read changes', e)
+            return None
+        if not rows:
+            return seq, []
+        return rows[-1][0], [key for _, key in rows]
+
+    def purge_changes(self, max_age):
+        """删除早于 max_age 秒的变更"""
+        try:
+            self.conn.execute('DELETE FROM changes WHERE created_at < ?', (time.time() - max_age,))
+        except sqlite3.Error as e:
+            self._log_error('purge changes', e)
+
+    def advance_queue(self, name, rate, burst, take=False):
+        """推进排队计数并可选取一个新号，返回 (已发最大号, 已放行到的号)，出错时返回 None
+
+        放行位置按 rate（个/秒）随时间前移，但最多领先已发号 burst 个：
+        空闲时新号立即放行，高峰时按 rate 依次放行。
+        """
+        now = time.time()
+        try:
+            with self._immediate() as conn:
+                row = conn.execute('SELECT issued, admitted, updated_at FROM queues WHERE name = ?',
+                                   (name,)).fetchone()
+                issued, admitted, updated_at = row if row else (0, float(burst), now)
+                admitted = min(admitted + max(now - updated_at, 0) * rate, issued + burst)
+                if take:
+                    issued += 1
+                conn.execute('INSERT OR REPLACE INTO queues (name, issued, admitted, updated_at) '
+                             'VALUES (?, ?, ?, ?)', (name, issued, admitted, now))
+        except sqlite3.Error as e:
+            self._log_error('advance queue', e)
+            return None
+        return issued, admitted
+
+    def purge_queues(self, max_idle):
+        """删除超过 max_idle 秒未推进的队列"""
+        try:
+            self.conn.execute('DELETE FROM queues WHERE updated_at < ?', (time.time() - max_idle,))
+        except sqlite3.Error as e:
+            self._log_error('purge queues', e)
+
+    def purge_expired(self):
+        """删除已过期的键值"""
+        try:
+            self.conn.execute('DELETE FROM blobs WHERE expires_at < ?', (time.time(),))
+        except sqlite3.Error as e:
+            self._log_error('purge', e)
+
+
+def get_shared_state():
+    """当前应用的共享状态实例"""
+    return current_app.extensions['shared_state']
+
+
+def init_app(app):
+    """按配置创建共享状态实例"""
+    state = SharedState(app.config['SHARED_STATE_PATH'], logger=app.logger)
+    app.extensions['shared_state'] = state
+    return state
+
+
+def _touch(session, table_name):
+    session.info.setdefault('touched_tables', set()).add(table_name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name:
+            _touch(session, table_name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_executed_tables(orm_execute_state):
+    # 绕过 flush 的 Core INSERT/UPDATE/DELETE 同样记为写入
+    statement = orm_execute_state.statement
+    if getattr(statement, 'is_dml', False) and getattr(statement, 'table', None) is not None:
+        _touch(orm_execute_state.session, statement.table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_tables(session):
+    touched = session.info.pop('touched_tables', None)
+    if touched and has_app_context() and 'shared_state' in current_app.extensions:
+        current_app.extensions['shared_state'].bump(sorted(touched))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('touched_tables', None)
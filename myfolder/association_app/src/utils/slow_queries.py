@@ -0,0 +1,215 @@
+"""慢查询日志
+
+执行时间超过 SLOW_QUERY_THRESHOLD_MS 的 SQL 语句写入 JSON Lines 文件（按大小轮转），
+每条记录包含：
+- 语句与绑定参数（默认脱敏：字符串、二进制只保留类型与长度，数字、日期等保留）；
+- 来源：请求的方法、路由规则与端点，请求之外（后台线程、命令行）记为 background；
+- 执行计划：在同一数据库连接上另开游标执行 EXPLAIN QUERY PLAN（SQLite）或
+  EXPLAIN（其他数据库，不带 ANALYZE，不会再次执行语句）。同一语句的计划在
+  PLAN_CACHE_SIZE 条内复用，避免反复 EXPLAIN。
+
+`flask slow-queries` 读取日志（含轮转出的旧文件），按语句汇总总耗时最高的若干条。
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+LOGGER_NAME = 'slow_queries'
+PLAN_CACHE_SIZE = 256
+# 只对这些语句做 EXPLAIN（DDL、PRAGMA、事务控制语句没有执行计划）
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+# PostgreSQL 上 EXPLAIN 失败会中止整个事务，用保存点隔离
+_PG_SAVEPOINT = 'slow_query_explain'
+_WHITESPACE = re.compile(r'\s+')
+
+
+def redact(value):
+    """脱敏单个参数：字符串与二进制只保留类型和长度"""
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value if not isinstance(value, Decimal) else str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return f'<str len={len(value)}>'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<bytes len={len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def format_parameters(parameters, redacted=True):
+    """参数转为可 JSON 序列化的形式；redacted=False 时原样保留（其余类型由 json 转为字符串）"""
+    fn = redact if redacted else (lambda value: value)
+    if isinstance(parameters, dict):
+        return {key: fn(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [fn(value) for value in parameters]
+    return None
+
+
+def normalize(statement):
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+def _origin():
+    if not has_request_context():
+        return {'route': 'background', 'endpoint': None}
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return {'route': f'{request.method} {rule}', 'endpoint': request.endpoint}
+
+
+class SlowQueryLog:
+    def __init__(self, engine, path, threshold_ms, redacted=True, explain=True,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.redacted = redacted
+        self.explain = explain
+        self.dialect = engine.dialect.name
+        self._plans = OrderedDict()
+        self._plans_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.logger = logging.getLogger(f'{LOGGER_NAME}.{id(self)}')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                      encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_query_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+        try:
+            plan = None
+            if self.explain and not executemany:
+                plan = self._plan(cursor.connection, statement, parameters)
+            self.logger.info(json.dumps({
+                'ts': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+                'duration_ms': round(elapsed * 1000, 3),
+                'statement': normalize(statement),
+                'parameters': None if executemany else format_parameters(parameters, self.redacted),
+                'executemany': executemany,
+                **_origin(),
+                'plan': plan,
+                'pid': os.getpid(),
+            }, ensure_ascii=False, default=str))
+        except Exception as e:
+            # 记录失败不影响原语句
+            logging.getLogger(LOGGER_NAME).warning(f'slow query log failed: {e}')
+
+    def _plan(self, dbapi_connection, statement, parameters):
+        key = normalize(statement)
+        with self._plans_lock:
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                return self._plans[key]
+        plan = self._run_explain(dbapi_connection, statement, parameters)
+        with self._plans_lock:
+            self._plans[key] = plan
+            while len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _run_explain(self, dbapi_connection, statement, parameters):
+        """返回计划的文本行列表，无法 EXPLAIN 时返回 None"""
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        prefix = 'EXPLAIN QUERY PLAN ' if self.dialect == 'sqlite' else 'EXPLAIN '
+        cursor = dbapi_connection.cursor()
+        postgres = self.dialect == 'postgresql'
+        try:
+            if postgres:
+                cursor.execute(f'SAVEPOINT {_PG_SAVEPOINT}')
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception as e:
+                if postgres:
+                    cursor.execute(f'ROLLBACK TO SAVEPOINT {_PG_SAVEPOINT}')
+                return [f'EXPLAIN failed: {e}']
+            if postgres:
+                cursor.execute(f'RELEASE SAVEPOINT {_PG_SAVEPOINT}')
+        finally:
+            cursor.close()
+        if self.dialect == 'sqlite':
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [' | '.join(str(col) for col in row) for row in rows]
+
+
+def read_records(path):
+    """按时间顺序读取日志及轮转出的旧文件（path.N ... path.1, path）"""
+    directory, name = os.path.split(path)
+    backups = []
+    if os.path.isdir(directory or '.'):
+        for entry in os.listdir(directory or '.'):
+            suffix = entry[len(name) + 1:]
+            if entry.startswith(name + '.') and suffix.isdigit():
+                backups.append((int(suffix), os.path.join(directory, entry)))
+    files = [p for _, p in sorted(backups, reverse=True)] + [path]
+    for file in files:
+        if not os.path.exists(file):
+            continue
+        with open(file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+
+def summarize(records, by='statement'):
+    """按语句（或来源路由）汇总，返回按总耗时降序的列表"""
+    groups = {}
+    for record in records:
+        key = record['statement'] if by == 'statement' else record.get('route') or 'background'
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'key': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                   'routes': {}, 'slowest': None}
+        duration = record['duration_ms']
+        group['count'] += 1
+        group['total_ms'] += duration
+        route = record.get('route') or 'background'
+        group['routes'][route] = group['routes'].get(route, 0) + 1
+        if duration >= group['max_ms']:
+            group['max_ms'] = duration
+            group['slowest'] = record
+    return sorted(groups.values(), key=lambda g: g['total_ms'], reverse=True)
+
+
+def init_app(app):
+    """在 init_db 之后调用（需要已创建的引擎）"""
+    from src.models import db
+
+    threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+    if threshold <= 0:
+        return
+    with app.app_context():
+        engine = db.get_engine()
+    app.extensions['slow_queries'] = SlowQueryLog(
+        engine, app.config['SLOW_QUERY_LOG'], threshold,
+        redacted=app.config['SLOW_QUERY_REDACT'], explain=app.config['SLOW_QUERY_EXPLAIN'])
@@ -0,0 +1,76 @@
+"""SPA 入口页缓存
+
+前端路由的所有页面都返回同一个 index.html，模板参数固定，因此只需按模板版本
+渲染一次：渲染结果连同 gzip 压缩体和各自的 ETag 保存在内存中，请求时直接返回
+字节，客户端缓存有效时返回 304。
+
+模板版本取模板文件的修改时间。调试模式或 TEMPLATES_AUTO_RELOAD 打开时每次请求
+检查一次，模板改动后自动重新渲染；生产环境只在首次请求时渲染。
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import Response, current_app, render_template, request
+
+from src.utils.conditional import add_validators, is_not_modified, not_modified_response
+
+TEMPLATE = 'index.html'
+# 模板中用到的前端占位变量，服务端不填充用户数据
+CONTEXT = {'currentUser': {'username': ''}, 'toastTitle': '', 'toastMessage': ''}
+
+
+class ShellCache:
+    def __init__(self, app, template=TEMPLATE, context=None):
+        self.app = app
+        self.template = template
+        self.context = CONTEXT if context is None else context
+        self._rendered = None
+        self._lock = threading.Lock()
+
+    def _version(self):
+        try:
+            return os.stat(os.path.join(self.app.template_folder, self.template)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _auto_reload(self):
+        return self.app.debug or self.app.config.get('TEMPLATES_AUTO_RELOAD')
+
+    def get(self):
+        """返回 (版本, 原文, 原文 ETag, gzip 体, gzip ETag)，按需重新渲染"""
+        rendered = self._rendered
+        if rendered is not None and not (self._auto_reload() and rendered[0] != self._version()):
+            return rendered
+        with self._lock:
+            version = self._version()
+            if self._rendered is None or self._rendered[0] != version:
+                if self._rendered is not None and self.app.jinja_env.cache is not None:
+                    # Jinja 未开启 auto_reload 时不会自行发现模板改动
+                    self.app.jinja_env.cache.clear()
+                body = render_template(self.template, **self.context).encode('utf-8')
+                compressed = gzip.compress(body, compresslevel=9, mtime=0)
+                self._rendered = (version, body, hashlib.sha1(body).hexdigest(),
+                                  compressed, hashlib.sha1(compressed).hexdigest())
+            return self._rendered
+
+
+def shell_response():
+    """返回缓存的入口页，客户端接受 gzip 时发送压缩体"""
+    _, body, etag, compressed, gzip_etag = current_app.extensions['spa_shell'].get()
+    use_gzip = bool(request.accept_encodings['gzip'])
+    if use_gzip:
+        body, etag = compressed, gzip_etag
+    if is_not_modified(etag):
+        response = not_modified_response(etag)
+    else:
+        response = add_validators(Response(body, mimetype='text/html'), etag)
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    app.extensions['spa_shell'] = ShellCache(app)
@@ -0,0 +1,138 @@
+"""静态资源指纹与预压缩
+
+无需前端构建工具：启动时（或 `flask build-assets`）扫描 static 目录，把每个资源
+按内容哈希复制为 static/dist/<目录>/<名称>.<哈希8位>.<扩展名>，文本类资源再生成
+.gz / .br（需安装 brotli）预压缩副本，映射关系写入 static/dist/manifest.json。
+
+- 模板中用 asset_url('css/style.css') 引用，得到带指纹的地址；
+- /static/dist/ 下的文件名随内容变化，响应带 Cache-Control: immutable，
+  并按 Accept-Encoding 直接返回预压缩副本；
+- 上传目录中的图片本身以内容哈希命名（见 images），同样按 immutable 缓存。
+
+调试模式下 asset_url 返回原始地址，修改资源后刷新即可生效。
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# 不参与指纹的目录：构建输出与用户上传
+SKIP_DIRS = {DIST_DIR, 'uploads'}
+ASSET_EXTS = {'.js', '.css', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp',
+              '.woff', '.woff2', '.ttf'}
+COMPRESSIBLE_EXTS = {'.js', '.css', '.svg', '.ico', '.ttf'}
+# 小于该字节数的文件压缩收益不大
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Accept-Encoding 编码 -> 预压缩副本后缀，按优先级排列
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _iter_assets(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            if os.path.splitext(name)[1].lower() in ASSET_EXTS:
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def build(static_folder):
+    """生成带指纹的副本与预压缩文件，返回 {原路径: 指纹路径}（相对 static）"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for rel, path in sorted(_iter_assets(static_folder)):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:8]
+        stem, ext = os.path.splitext(rel)
+        target = f'{stem}.{digest}{ext}'
+        out = os.path.join(dist, target)
+        # 内容不变时文件名不变，已存在即可跳过
+        if not os.path.exists(out):
+            _write_atomic(out, data)
+            if ext.lower() in COMPRESSIBLE_EXTS and len(data) >= MIN_COMPRESS_BYTES:
+                _write_atomic(out + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write_atomic(out + '.br', brotli.compress(data))
+        manifest[rel] = f'{DIST_DIR}/{target}'
+    _write_atomic(os.path.join(dist, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(path):
+    """模板用：资源的指纹地址，未登记或调试模式时返回原始地址"""
+    manifest = current_app.extensions['static_manifest']
+    if current_app.debug or path not in manifest:
+        return f'/static/{path}'
+    return f'/static/{manifest[path]}'
+
+
+def serve_dist(filename):
+    """返回指纹资源，客户端支持时直接发送预压缩副本"""
+    folder = os.path.join(current_app.static_folder, DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and \
+                os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype,
+                                           max_age=31536000)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        if filename.endswith(('.gz', '.br')) or filename == MANIFEST_NAME:
+            raise NotFound()
+        response = send_from_directory(folder, filename, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _cache_uploads(response):
+    # 上传的图片按内容哈希命名，内容不会变化
+    if response.status_code == 200 and request.path.startswith('/static/uploads/'):
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_app(app):
+    if app.config['STATIC_BUILD_ON_START']:
+        try:
+            build(app.static_folder)
+        except OSError as e:
+            app.logger.warning(f'static asset build failed: {e}')
+    app.extensions['static_manifest'] = load_manifest(app.static_folder)
+    app.jinja_env.globals['asset_url'] = asset_url
+    # 比 Flask 默认的 /static/<path:filename> 更具体，优先匹配
+    app.add_url_rule(f'/static/{DIST_DIR}/<path:filename>', 'static_dist', serve_dist)
+    app.after_request(_cache_uploads)
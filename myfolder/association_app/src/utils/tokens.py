@@ -0,0 +1,136 @@
+"""无状态令牌认证
+
+访问令牌（短期，默认 15 分钟）携带用户 id 与角色，接口据此授权而无需查库；
+刷新令牌（长期）只用于换取新的访问令牌，换取时重新读取用户角色。
+
+吊销信息存放在共享状态中：
+- revoked:jti:<jti>   单个令牌被吊销（登出、刷新令牌轮换）
+- revoked:user:<id>   该时间点之前签发的访问令牌全部失效（角色变更、删除用户等）
+
+访问令牌每个请求都要校验，吊销列表在每个 worker 内存中缓存一份，
+每 TOKEN_REVOCATION_REFRESH 秒重新加载，因此角色变更最迟在一个刷新间隔后生效。
+刷新令牌使用频率低，每次都直接查询共享状态；轮换时原子地吊销旧令牌，
+同一刷新令牌在任何 worker 上都只能换取一次，重放立即失败。
+"""
+import threading
+import time
+import uuid
+
+import jwt
+from flask import current_app
+
+from src.utils.shared_state import get_shared_state
+
+ALGORITHM = 'HS256'
+_REVOKED_PREFIX = 'revoked:'
+
+
+class TokenError(Exception):
+    """令牌无效、过期或已被吊销"""
+
+
+class RevocationList:
+    """吊销列表的进程内缓存"""
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._jtis = set()
+        self._user_cutoffs = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._loaded_at < self.refresh_interval:
+            return
+        with self._lock:
+            if now - self._loaded_at < self.refresh_interval:
+                return
+            entries = get_shared_state().scan(_REVOKED_PREFIX)
+            if entries is not None:
+                jtis, cutoffs = set(), {}
+                for key, value in entries.items():
+                    _, kind, ident = key.split(':', 2)
+                    if kind == 'jti':
+                        jtis.add(ident)
+                    elif kind == 'user':
+                        cutoffs[ident] = float(value)
+                self._jtis, self._user_cutoffs = jtis, cutoffs
+            self._loaded_at = now
+
+    def is_revoked(self, claims):
+        if claims['type'] == 'refresh':
+            # 刷新令牌不走缓存：刚被轮换或登出的令牌在其他 worker 上也不能再用
+            return get_shared_state().get(f"{_REVOKED_PREFIX}jti:{claims.get('jti')}") is not None
+        self._refresh()
+        if claims.get('jti') in self._jtis:
+            return True
+        cutoff = self._user_cutoffs.get(claims['sub'])
+        return cutoff is not None and claims['type'] == 'access' and claims['iat'] < cutoff
+
+    def invalidate(self):
+        """本 worker 发起的吊销立即生效"""
+        self._loaded_at = 0.0
+
+
+def _config(name):
+    return current_app.config[name]
+
+
+def _encode(claims, ttl):
+    # iat 保留小数（JWT 的 NumericDate 允许），与吊销时间点精确比较
+    now = time.time()
+    payload = {**claims, 'iat': now, 'exp': int(now) + ttl, 'jti': uuid.uuid4().hex}
+    return jwt.encode(payload, _config('SECRET_KEY'), algorithm=ALGORITHM)
+
+
+def issue_tokens(user):
+    """签发访问令牌与刷新令牌"""
+    access_ttl = _config('JWT_ACCESS_TTL')
+    return {
+        'access_token': _encode({'sub': str(user.id), 'role': user.role, 'type': 'access'}, access_ttl),
+        'refresh_token': _encode({'sub': str(user.id), 'type': 'refresh'}, _config('JWT_REFRESH_TTL')),
+        'token_type': 'Bearer',
+        'expires_in': access_ttl,
+    }
+
+
+def verify(token, expected_type):
+    """校验签名、有效期、类型与吊销状态，返回 claims"""
+    try:
+        claims = jwt.decode(token, _config('SECRET_KEY'), algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise TokenError('令牌已过期')
+    except jwt.InvalidTokenError:
+        raise TokenError('令牌无效')
+    if claims.get('type') != expected_type or 'sub' not in claims:
+        raise TokenError('令牌无效')
+    if current_app.extensions['token_revocations'].is_revoked(claims):
+        raise TokenError('令牌已失效')
+    return claims
+
+
+def revoke(claims):
+    """吊销单个令牌，保留到其自然过期为止
+
+    返回本次调用是否吊销了该令牌：并发请求用同一令牌时只有一个返回 True，
+    刷新令牌轮换据此保证一个令牌只能换取一次。共享状态出错时返回 True。
+    """
+    ttl = max(1, int(claims['exp'] - time.time()))
+    state = get_shared_state()
+    state.purge_expired()
+    first = state.update(f"{_REVOKED_PREFIX}jti:{claims['jti']}",
+                         lambda current: ('1', current is None), ttl=ttl)
+    current_app.extensions['token_revocations'].invalidate()
+    return first is not False
+
+
+def revoke_user_access(user_id):
+    """使该用户此前签发的访问令牌全部失效（需用刷新令牌换取新令牌）"""
+    get_shared_state().set(f'{_REVOKED_PREFIX}user:{user_id}', str(time.time()),
+                           ttl=_config('JWT_ACCESS_TTL'))
+    current_app.extensions['token_revocations'].invalidate()
+
+
+def init_app(app):
+    app.extensions['token_revocations'] = RevocationList(app.config['TOKEN_REVOCATION_REFRESH'])
@@ -0,0 +1,80 @@
+"""管理员用户目录检索
+
+q 对用户名、姓名、学号、邮箱做前缀匹配，匹配区分大小写：
+- SQLite 按二进制比较字符串，写成范围条件 col >= q AND col < 上界，上界为 q 的
+  最后一个字符加一，直接走各列的 B 树索引（LIKE 'q%' 在 SQLite 默认不区分大小写，
+  用不上普通索引）；
+- PostgreSQL 在非 C 排序规则下范围条件不等价于前缀匹配，改用转义后的 LIKE 'q%'，
+  由 text_pattern_ops 索引支持（迁移 8 创建）。
+
+结果按 id 倒序做键集分页。"按 id 顺序扫描到够一页为止"与"先从各列索引取出
+全部匹配 id 再排序"两种执行方式各有适用范围：前缀越宽泛前者越快，越精确后者越快，
+而 LIMIT 作为绑定参数时 SQLite 总是选前者。因此先用各列索引数出匹配数
+（每列最多数 PROBE_CAP 条），少于 PROBE_CAP 时显式按索引取 id，否则按 id 顺序扫描。
+
+院系、专业、角色为等值过滤。
+"""
+from sqlalchemy import and_, func, literal, or_, select, union_all
+
+from src.models import db
+from src.models.user import User
+
+SEARCH_COLUMNS = (User.username, User.full_name, User.student_id, User.email)
+FILTER_COLUMNS = {'department': User.department, 'major': User.major, 'role': User.role}
+# 匹配数少于该值时走索引取 id 再排序
+PROBE_CAP = 2000
+_MAX_CODE_POINT = 0x10FFFF
+_SURROGATES = range(0xD800, 0xE000)
+
+
+def prefix_upper_bound(prefix):
+    """大于所有以 prefix 开头的字符串的最小上界（按码位比较），不存在时返回 None
+
+    最后一个字符加一（跳过代理区）；已是最大码位则去掉它再对前面的字符加一。
+    """
+    while prefix:
+        code = ord(prefix[-1]) + 1
+        if code in _SURROGATES:
+            code = _SURROGATES.stop
+        if code <= _MAX_CODE_POINT:
+            return prefix[:-1] + chr(code)
+        prefix = prefix[:-1]
+    return None
+
+
+def prefix_condition(column, prefix):
+    if db.engine.dialect.name == 'postgresql':
+        return column.startswith(prefix, autoescape=True)
+    upper = prefix_upper_bound(prefix)
+    if upper is None:
+        return column >= prefix
+    return and_(column >= prefix, column < upper)
+
+
+def estimate_matches(q):
+    """各列前缀匹配数之和，每列最多数到 PROBE_CAP（只读索引）"""
+    counts = [
+        select(func.count()).select_from(
+            select(literal(1)).where(prefix_condition(col, q)).limit(PROBE_CAP).subquery()
+        ).scalar_subquery()
+        for col in SEARCH_COLUMNS
+    ]
+    return sum(db.session.execute(select(*counts)).one())
+
+
+def build_query(q=None, filters=None, after_id=None):
+    """返回按 id 倒序、已应用检索条件的查询"""
+    query = User.query
+    if q:
+        if estimate_matches(q) < PROBE_CAP:
+            matched = union_all(*(select(User.id).where(prefix_condition(col, q))
+                                  for col in SEARCH_COLUMNS))
+            query = query.filter(User.id.in_(matched))
+        else:
+            query = query.filter(or_(*(prefix_condition(col, q) for col in SEARCH_COLUMNS)))
+    for name, value in (filters or {}).items():
+        if value:
+            query = query.filter(FILTER_COLUMNS[name] == value)
+    if after_id is not None:
+        query = query.filter(User.id < after_id)
+    return query.order_by(User.id.desc())
@@ -0,0 +1,102 @@
+"""非关键字段的写后缓冲
+
+last_login 这类允许短暂延迟的字段先记在内存里，同一行多次写入只保留最后一次，
+由后台线程按间隔（WRITE_BEHIND_INTERVAL 秒）或积压条数（WRITE_BEHIND_MAX_ITEMS）
+合并成批量 UPDATE 落库；进程退出时再刷新一次。请求路径上不产生写事务。
+
+缓冲只保存在当前进程内，worker 被强制杀死时最多丢失一个间隔内的数据，
+因此只能用于丢失可以接受的字段。
+"""
+import atexit
+import os
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam
+
+
+class WriteBehindBuffer:
+    def __init__(self, app, interval=5.0, max_items=500):
+        self.app = app
+        self.interval = interval
+        self.max_items = max_items
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    def record(self, table, row_id, **values):
+        """登记一次行更新，同一行的字段与已登记的合并"""
+        with self._lock:
+            self._pending.setdefault((table, row_id), {}).update(values)
+            backlog = len(self._pending)
+        self._ensure_thread()
+        if backlog >= self.max_items:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # 线程不会随 fork 复制，按进程启动一次
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name='write-behind', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.error(f'write-behind flush failed: {e}', exc_info=True)
+
+    def flush(self):
+        """把缓冲的更新按 (表, 字段集合) 分组，各用一条 executemany UPDATE 写入"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        groups = {}
+        for (table, row_id), values in pending.items():
+            columns = tuple(sorted(values))
+            groups.setdefault((table, columns), []).append(
+                {'_id': row_id, **{f'_{col}': value for col, value in values.items()}})
+
+        from src.models import db
+
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    for (table, columns), rows in groups.items():
+                        stmt = table.update() \
+                            .where(table.c.id == bindparam('_id')) \
+                            .values({col: bindparam(f'_{col}') for col in columns})
+                        conn.execute(stmt, rows)
+        except Exception:
+            # 写入失败时放回缓冲，期间产生的新值优先
+            with self._lock:
+                for key, values in pending.items():
+                    self._pending[key] = {**values, **self._pending.get(key, {})}
+            raise
+        return len(pending)
+
+
+def record(table, row_id, **values):
+    """登记到当前应用的写后缓冲；未启用缓冲时不做任何事"""
+    if has_app_context() and 'write_behind' in current_app.extensions:
+        current_app.extensions['write_behind'].record(table, row_id, **values)
+        return True
+    return False
+
+
+def init_app(app):
+    app.extensions['write_behind'] = WriteBehindBuffer(
+        app,
+        interval=app.config['WRITE_BEHIND_INTERVAL'],
+        max_items=app.config['WRITE_BEHIND_MAX_ITEMS'],
+    )
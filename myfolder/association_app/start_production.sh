@@ -19,5 +19,9 @@ mkdir -p src/static/uploads
 chmod -R 755 src/static
 chmod -R 777 src/static/uploads
 
+# 名额推送（SSE 长连接）由单独的 gevent 进程承载，不占用下面普通 worker；
+# 需由 Nginx 把 /api/activities/seats/stream 转发到 5001（见 DEPLOYMENT_GUIDE.md）
+gunicorn -k gevent -w 1 --worker-connections 2000 -b 127.0.0.1:5001 "src.main:app" &
+
 # 使用gunicorn启动应用
 gunicorn -w 4 -b 0.0.0.0:5000 "src.main:app"
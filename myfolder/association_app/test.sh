@@ -3,6 +3,9 @@
 # 创建测试脚本
 echo "开始测试重庆师范大学师能素质协会活动报名系统..."
 
+# 确保工作目录正确
+cd "$(dirname "$0")"
+
 # 测试数据库连接
 echo "测试数据库连接..."
 python3 -c "
@@ -25,6 +28,64 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
+# 测试查询次数：我的报名列表为一条 JOIN 查询，语句数不随报名条数增长
+echo "测试我的报名查询次数..."
+TEST_DIR=$(mktemp -d)
+DATABASE_URL="sqlite:///$TEST_DIR/test.db" SHARED_STATE_PATH="$TEST_DIR/shared_state.db" \
+SLOW_QUERY_THRESHOLD_MS=0 STATIC_BUILD_ON_START=false python3 -c "
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from src.main import app
+from src.models import db, User, Activity, Registration
+
+def count_statements(client, url):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements), response.get_json()
+
+with app.app_context():
+    now = datetime.utcnow()
+    user = User(username='counter', email='counter@example.com', password='password123', full_name='计数')
+    db.session.add(user)
+    db.session.flush()
+    counts, created = [], 0
+    for total in (3, 30):
+        while created < total:
+            activity = Activity(title='活动', description='测试', location='教室',
+                                start_time=now + timedelta(days=2), end_time=now + timedelta(days=3),
+                                registration_deadline=now + timedelta(days=1), max_participants=10)
+            db.session.add(activity)
+            db.session.flush()
+            db.session.add(Registration(user_id=user.id, activity_id=activity.id))
+            created += 1
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user.id
+        n, data = count_statements(client, '/api/registration/my-registrations')
+        assert len(data['registrations']) == total and data['next_cursor'] is None, data
+        counts.append(n)
+    if counts[0] != counts[1]:
+        print(f'查询次数随报名条数增长: 3 条 {counts[0]} 次, 30 条 {counts[1]} 次')
+        sys.exit(1)
+    n, data = count_statements(client, '/api/registration/my-registrations?limit=10')
+    assert len(data['registrations']) == 10 and data['next_cursor'], data
+    print(f'查询次数测试通过: {counts[1]} 条语句')
+"
+STATUS=$?
+rm -rf "$TEST_DIR"
+if [ $STATUS -ne 0 ]; then
+    echo "查询次数测试失败"
+    exit 1
+fi
+
 # 测试API端点
 echo "测试API端点..."
 python3 -c "